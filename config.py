@@ -5,17 +5,7 @@ from dotenv import load_dotenv
 from pydantic import Field, field_validator
 from urllib.parse import urlparse
 import structlog
-
-# Configure structlog
-structlog.configure(
-    processors=[
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.JSONRenderer()
-    ],
-    wrapper_class=structlog.BoundLogger,
-    context_class=dict,
-    logger_factory=structlog.PrintLoggerFactory(),
-)
+from log import configure_logging
 
 logger = structlog.get_logger()
 
@@ -45,6 +35,34 @@ class Settings(BaseSettings):
     BOT_TOKEN: str = Field(..., env='BOT_TOKEN')
     USER_ID: Optional[int] = Field(None, env='USER_ID')
     
+    # Bot API server; empty means api.telegram.org, set for a local telegram-bot-api server
+    TELEGRAM_API_URL: str = Field(
+        default='',
+        env='TELEGRAM_API_URL'
+    )
+    
+    # Update delivery: polling or webhook
+    BOT_MODE: str = Field(
+        default='polling',
+        env='BOT_MODE'
+    )
+    WEBHOOK_URL: str = Field(
+        default='',
+        env='WEBHOOK_URL'
+    )
+    WEBHOOK_PATH: str = Field(
+        default='/webhook',
+        env='WEBHOOK_PATH'
+    )
+    WEBHOOK_SECRET: str = Field(
+        default='',
+        env='WEBHOOK_SECRET'
+    )
+    WEBHOOK_MAX_CONNECTIONS: int = Field(
+        default=40,
+        env='WEBHOOK_MAX_CONNECTIONS'
+    )
+    
     # Redis settings
     REDIS_URL: Optional[str] = Field(None, env='REDIS_URL')
     REDIS_HOST: str = Field(
@@ -68,6 +86,24 @@ class Settings(BaseSettings):
         env='REDIS_USER'
     )
     
+    # Shared Redis connection pool
+    REDIS_MAX_CONNECTIONS: int = Field(
+        default=50,
+        env='REDIS_MAX_CONNECTIONS'
+    )
+    REDIS_POOL_TIMEOUT: float = Field(
+        default=5.0,
+        env='REDIS_POOL_TIMEOUT'
+    )
+    REDIS_SOCKET_TIMEOUT: float = Field(
+        default=5.0,
+        env='REDIS_SOCKET_TIMEOUT'
+    )
+    REDIS_HEALTH_CHECK_INTERVAL: int = Field(
+        default=30,
+        env='REDIS_HEALTH_CHECK_INTERVAL'
+    )
+    
     @field_validator('REDIS_PORT', 'REDIS_DB', mode='before')
     @classmethod
     def parse_int_fields(cls, v, info):
@@ -112,7 +148,15 @@ class Settings(BaseSettings):
         if v is None or v == '':
             return None
         return clean_template_var(str(v))
-    
+
+    @field_validator('BOT_MODE', mode='before')
+    @classmethod
+    def validate_bot_mode(cls, v):
+        v = str(v or 'polling').strip().lower()
+        if v not in ('polling', 'webhook'):
+            raise ValueError("BOT_MODE must be 'polling' or 'webhook'")
+        return v
+
     @property
     def redis_url(self) -> str:
         """Get Redis URL with proper configuration for Railway"""
@@ -147,6 +191,21 @@ class Settings(BaseSettings):
         env='LOG_FORMAT'
     )
     
+    # Tracing: share of updates whose span tree is logged, and the duration
+    # (seconds, 0 disables) above which it is always logged
+    TRACE_SAMPLE_RATE: float = Field(
+        default=0.0,
+        env='TRACE_SAMPLE_RATE'
+    )
+    TRACE_SLOW_THRESHOLD: float = Field(
+        default=1.0,
+        env='TRACE_SLOW_THRESHOLD'
+    )
+    TRACE_MAX_SPANS: int = Field(
+        default=200,
+        env='TRACE_MAX_SPANS'
+    )
+    
     # Timezone settings
     TZ: str = Field(
         default='Europe/Moscow',
@@ -162,17 +221,32 @@ class Settings(BaseSettings):
         default=60,
         env='RATE_LIMIT_PERIOD'
     )
+    # Button presses get their own budget: multi-select takes many taps in a row
+    RATE_LIMIT_CALLBACKS: int = Field(
+        default=120,
+        env='RATE_LIMIT_CALLBACKS'
+    )
     
-    # Health check settings
+    # Health check settings: background probe interval and per-probe timeout
     HEALTH_CHECK_INTERVAL: int = Field(
-        default=300,
+        default=15,
         env='HEALTH_CHECK_INTERVAL'
     )
     HEALTH_CHECK_TIMEOUT: int = Field(
-        default=30,
+        default=5,
         env='HEALTH_CHECK_TIMEOUT'
     )
     
+    # Startup settings
+    STARTUP_DELAY: int = Field(
+        default=0,
+        env='STARTUP_DELAY'
+    )
+    STARTUP_BUDGET: float = Field(
+        default=15.0,
+        env='STARTUP_BUDGET'
+    )
+    
     # Keep-alive settings
     KEEP_ALIVE_INTERVAL: int = Field(
         default=300,
@@ -183,12 +257,124 @@ class Settings(BaseSettings):
         env='KEEP_ALIVE_TIMEOUT'
     )
     
+    # Report rendering settings
+    REPORT_WORKERS: int = Field(
+        default=2,
+        env='REPORT_WORKERS'
+    )
+    REPORT_MAX_CONCURRENCY: int = Field(
+        default=2,
+        env='REPORT_MAX_CONCURRENCY'
+    )
+    REPORT_TIMEOUT: int = Field(
+        default=60,
+        env='REPORT_TIMEOUT'
+    )
+    REPORT_MAX_JOBS: int = Field(
+        default=4,
+        env='REPORT_MAX_JOBS'
+    )
+    REPORT_PRERENDER_ACTIVE_DAYS: int = Field(
+        default=7,
+        env='REPORT_PRERENDER_ACTIVE_DAYS'
+    )
+    REPORT_PRERENDER_BUDGET: int = Field(
+        default=600,
+        env='REPORT_PRERENDER_BUDGET'
+    )
+    REPORT_CACHE_DIR: str = Field(
+        default='reports/cache',
+        env='REPORT_CACHE_DIR'
+    )
+    REPORT_CACHE_MAX_ENTRIES: int = Field(
+        default=50,
+        env='REPORT_CACHE_MAX_ENTRIES'
+    )
+    
+    # Broadcast settings
+    BROADCAST_RATE: float = Field(
+        default=30.0,
+        env='BROADCAST_RATE'
+    )
+    BROADCAST_CHAT_INTERVAL: float = Field(
+        default=1.0,
+        env='BROADCAST_CHAT_INTERVAL'
+    )
+    BROADCAST_WORKERS: int = Field(
+        default=8,
+        env='BROADCAST_WORKERS'
+    )
+    BROADCAST_MAX_RETRIES: int = Field(
+        default=3,
+        env='BROADCAST_MAX_RETRIES'
+    )
+    
+    # Scheduler settings
+    SCHEDULER_KEY_PREFIX: str = Field(
+        default='focus_bot:scheduler',
+        env='SCHEDULER_KEY_PREFIX'
+    )
+    SCHEDULER_LEASE_TTL: int = Field(
+        default=30,
+        env='SCHEDULER_LEASE_TTL'
+    )
+    SCHEDULER_MISFIRE_GRACE: int = Field(
+        default=300,
+        env='SCHEDULER_MISFIRE_GRACE'
+    )
+    SCHEDULER_JITTER: int = Field(
+        default=60,
+        env='SCHEDULER_JITTER'
+    )
+    
+    # Multi-process update handling: 0 keeps everything in one process
+    UPDATE_WORKERS: int = Field(
+        default=0,
+        env='UPDATE_WORKERS'
+    )
+    UPDATE_WORKER_CONCURRENCY: int = Field(
+        default=32,
+        env='UPDATE_WORKER_CONCURRENCY'
+    )
+    UPDATE_QUEUE_PREFIX: str = Field(
+        default='focus_bot:updates',
+        env='UPDATE_QUEUE_PREFIX'
+    )
+    
+    # Outbound queue settings
+    OUTBOUND_RATE: float = Field(
+        default=30.0,
+        env='OUTBOUND_RATE'
+    )
+    OUTBOUND_INTERACTIVE_RATE: float = Field(
+        default=30.0,
+        env='OUTBOUND_INTERACTIVE_RATE'
+    )
+    OUTBOUND_NOTIFICATION_RATE: float = Field(
+        default=25.0,
+        env='OUTBOUND_NOTIFICATION_RATE'
+    )
+    OUTBOUND_BULK_RATE: float = Field(
+        default=20.0,
+        env='OUTBOUND_BULK_RATE'
+    )
+    
+    # Notification digest settings
+    DIGEST_WINDOW: int = Field(
+        default=60,
+        env='DIGEST_WINDOW'
+    )
+    
     # Paths configuration
     DATA_DIR: str = "data"
     CHECKLIST_PATH: str = os.path.join(DATA_DIR, "checklist.json")
     GOALS_PATH: str = os.path.join(DATA_DIR, "goals.json")
     SCHEDULE_PATH: str = os.path.join(DATA_DIR, "schedule.json")
     MOOD_PATH: str = os.path.join(DATA_DIR, "mood.json")
+    USERS_PATH: str = os.path.join(DATA_DIR, "users.json")
+    BROADCASTS_DIR: str = os.path.join(DATA_DIR, "broadcasts")
+    DIGEST_PATH: str = os.path.join(DATA_DIR, "digests.json")
+    STORAGE_LOCK_PATH: str = os.path.join(DATA_DIR, ".storage.lock")
     
     model_config = SettingsConfigDict(
         env_file='.env',
@@ -199,5 +385,8 @@ class Settings(BaseSettings):
 # Create global settings instance
 settings = Settings()
 
+# Logging is configured once, before any module logs anything
+configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+
 # Ensure data directory exists
 os.makedirs(settings.DATA_DIR, exist_ok=True)
\ No newline at end of file
@@ -4,6 +4,7 @@ from .goals import router as goals_router
 from .progress import router as progress_router
 from .mood import router as mood_router
 from .schedule import router as schedule_router
+from .export import router as export_router
 
 def register_handlers(dp):
     dp.include_router(start_router)
@@ -12,3 +13,4 @@ def register_handlers(dp):
     dp.include_router(progress_router)
     dp.include_router(mood_router)
     dp.include_router(schedule_router)
+    dp.include_router(export_router)
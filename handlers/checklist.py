@@ -1,9 +1,11 @@
 from aiogram import Router, F, Bot
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from states.add_task import AddTask
 from services.storage import task_storage, ValidationError, StorageError
+from services.quick_add import parse_quick_add
 from keyboards.checklist import ChecklistKeyboard
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
@@ -26,6 +28,13 @@ DEADLINE_PRESETS = {
     "no_deadline": "Без дедлайна"
 }
 
+QUICK_ADD_HINT = (
+    "Отправьте задачи, по одной на строку. Можно указать приоритет и дедлайн:\n"
+    "Купить продукты !high @завтра\n"
+    "Сдать отчет @2026-11-01\n"
+    "Позвонить маме !low @25.12"
+)
+
 def format_deadline(deadline: str) -> str:
     """Форматирует дедлайн для отображения"""
     if not deadline:
@@ -103,7 +112,7 @@ async def show_checklist(message: Message):
 
 @router.callback_query(F.data == "add_task")
 async def start_add_task(callback: CallbackQuery, state: FSMContext):
-    await callback.message.answer("Введите текст новой задачи:")
+    await callback.message.answer(QUICK_ADD_HINT)
     await state.set_state(AddTask.waiting_for_task_text)
     await callback.answer()
 
@@ -111,6 +120,7 @@ async def start_add_task(callback: CallbackQuery, state: FSMContext):
 async def toggle_task_status(callback: CallbackQuery):
     try:
         task_text = callback.data.split(":")[1]
+        await task_storage.acquire_lock()
         tasks = task_storage.get_tasks()
         
         for task in tasks:
@@ -133,6 +143,7 @@ async def toggle_task_status(callback: CallbackQuery):
 async def delete_task(callback: CallbackQuery):
     try:
         task_text = callback.data.split(":")[1]
+        await task_storage.acquire_lock()
         tasks = task_storage.get_tasks()
         tasks = [task for task in tasks if task["text"] != task_text]
         task_storage.save_data(tasks)
@@ -143,21 +154,172 @@ async def delete_task(callback: CallbackQuery):
     except StorageError as e:
         await callback.answer(f"❌ Произошла ошибка: {str(e)}", show_alert=True)
 
-@router.message(AddTask.waiting_for_task_text)
-async def receive_task_text(message: Message, state: FSMContext):
+BULK_PRIORITIES = {
+    "high": "высокий",
+    "medium": "средний",
+    "low": "низкий"
+}
+
+@router.callback_query(F.data == "bulk_mode")
+async def start_bulk_mode(callback: CallbackQuery, state: FSMContext):
     try:
-        text = message.text.strip()
-        task_storage.validate_text(text)
+        tasks = task_storage.get_tasks()
+        await state.update_data(bulk_selected=[])
+        keyboard = checklist_keyboard.get_bulk_keyboard(tasks, set())
+        await callback.message.edit_text(**keyboard)
+        await callback.answer()
+    except StorageError as e:
+        await callback.answer(f"❌ Произошла ошибка: {str(e)}", show_alert=True)
+
+@router.callback_query(F.data.startswith("bulk_select:"))
+async def toggle_bulk_selection(callback: CallbackQuery, state: FSMContext):
+    try:
+        target = callback.data.split(":", 1)[1]
+        tasks = task_storage.get_tasks()
+        task_ids = {task["id"] for task in tasks}
+        data = await state.get_data()
+        # Выбор хранит id задач; удаленные с тех пор задачи выпадают из него
+        selected = set(data.get("bulk_selected", [])) & task_ids
         
-        task_storage.add_task(
-            text=text,
-            priority="средний"  # Default priority
-        )
+        if target == "all":
+            selected = task_ids
+        elif target == "none":
+            selected = set()
+        else:
+            if target not in task_ids:
+                await callback.answer("❌ Задача не найдена", show_alert=True)
+                return
+            selected ^= {target}
         
+        await state.update_data(bulk_selected=sorted(selected))
+        keyboard = checklist_keyboard.get_bulk_keyboard(tasks, selected)
+        await callback.message.edit_text(**keyboard)
+        await callback.answer()
+    except StorageError as e:
+        await callback.answer(f"❌ Произошла ошибка: {str(e)}", show_alert=True)
+
+@router.callback_query(F.data.startswith("bulk_apply:"))
+async def apply_bulk_action(callback: CallbackQuery, state: FSMContext):
+    try:
+        action = callback.data.split(":")[1]
+        data = await state.get_data()
+        selected = data.get("bulk_selected", [])
+        
+        if not selected:
+            await callback.answer("Сначала отметьте задачи", show_alert=True)
+            return
+        
+        await task_storage.acquire_lock()
+        if action == "complete":
+            count = task_storage.update_tasks(selected, completed=True)
+            result = f"✅ Выполнено задач: {count}"
+        elif action == "delete":
+            count = task_storage.delete_tasks(selected)
+            result = f"🗑️ Удалено задач: {count}"
+        elif action.startswith("priority_") and action[len("priority_"):] in BULK_PRIORITIES:
+            priority = BULK_PRIORITIES[action[len("priority_"):]]
+            count = task_storage.update_tasks(selected, priority=priority)
+            result = f"{PRIORITY_ICONS[priority]} Приоритет изменён у задач: {count}"
+        else:
+            await callback.answer("❌ Неизвестное действие", show_alert=True)
+            return
+        
+        await state.update_data(bulk_selected=[])
         tasks = task_storage.get_tasks()
         keyboard = checklist_keyboard.get_checklist_keyboard(tasks)
-        await message.answer(**keyboard)
-        await state.clear()
+        await callback.message.edit_text(**keyboard)
+        await callback.answer(result)
+    except ValidationError as e:
+        await callback.answer(f"❌ Ошибка: {str(e)}", show_alert=True)
+    except StorageError as e:
+        await callback.answer(f"❌ Произошла ошибка: {str(e)}", show_alert=True)
+
+@router.callback_query(F.data == "bulk_cancel")
+async def cancel_bulk_mode(callback: CallbackQuery, state: FSMContext):
+    try:
+        await state.update_data(bulk_selected=[])
+        tasks = task_storage.get_tasks()
+        keyboard = checklist_keyboard.get_checklist_keyboard(tasks)
+        await callback.message.edit_text(**keyboard)
+        await callback.answer()
+    except StorageError as e:
+        await callback.answer(f"❌ Произошла ошибка: {str(e)}", show_alert=True)
+
+@router.callback_query(F.data == "complete_all")
+async def complete_all_tasks(callback: CallbackQuery):
+    try:
+        await task_storage.acquire_lock()
+        count = task_storage.complete_all()
+        if not count:
+            await callback.answer("Все задачи уже выполнены")
+            return
+        
+        tasks = task_storage.get_tasks()
+        keyboard = checklist_keyboard.get_checklist_keyboard(tasks)
+        await callback.message.edit_text(**keyboard)
+        await callback.answer(f"✅ Выполнено задач: {count}")
+    except StorageError as e:
+        await callback.answer(f"❌ Произошла ошибка: {str(e)}", show_alert=True)
+
+@router.callback_query(F.data == "clear_completed")
+async def clear_completed_tasks(callback: CallbackQuery):
+    try:
+        await task_storage.acquire_lock()
+        count = task_storage.clear_completed()
+        if not count:
+            await callback.answer("Нет выполненных задач")
+            return
+        
+        tasks = task_storage.get_tasks()
+        keyboard = checklist_keyboard.get_checklist_keyboard(tasks)
+        await callback.message.edit_text(**keyboard)
+        await callback.answer(f"🧹 Удалено выполненных задач: {count}")
+    except StorageError as e:
+        await callback.answer(f"❌ Произошла ошибка: {str(e)}", show_alert=True)
+
+async def quick_add_tasks(message: Message, text: str) -> None:
+    """Добавляет задачи из многострочного текста одной записью и отвечает одной сводкой"""
+    parsed = parse_quick_add(text)
+    errors = [f"строка {number}: {error}" for number, error in parsed.errors]
+    
+    valid = []
+    for item in parsed.tasks:
+        try:
+            task_storage.validate_text(item["text"])
+            valid.append(item)
+        except ValidationError as e:
+            errors.append(f"«{item['text'][:30]}»: {str(e)}")
+    
+    await task_storage.acquire_lock()
+    added = task_storage.add_tasks(valid)
+    
+    summary = f"✅ Добавлено задач: {added}"
+    if errors:
+        summary += "\n⚠️ Пропущено:\n" + "\n".join(errors)
+    
+    tasks = task_storage.get_tasks()
+    keyboard = checklist_keyboard.get_checklist_keyboard(tasks)
+    keyboard["text"] = f"{summary}\n\n{keyboard['text']}"
+    await message.answer(**keyboard)
+
+@router.message(Command("add"))
+async def cmd_quick_add(message: Message, command: CommandObject, state: FSMContext):
+    if not command.args:
+        await message.answer(QUICK_ADD_HINT)
+        await state.set_state(AddTask.waiting_for_task_text)
+        return
+    
+    try:
+        await quick_add_tasks(message, command.args)
+    except ValidationError as e:
+        await message.answer(f"❌ Ошибка: {str(e)}")
+    except StorageError as e:
+        await message.answer(f"❌ Произошла ошибка: {str(e)}")
+
+@router.message(AddTask.waiting_for_task_text)
+async def receive_task_text(message: Message, state: FSMContext):
+    try:
+        await quick_add_tasks(message, message.text or "")
     except ValidationError as e:
         await message.answer(f"❌ Ошибка: {str(e)}")
     except StorageError as e:
@@ -218,6 +380,7 @@ async def receive_deadline(callback: CallbackQuery, state: FSMContext):
         if deadline == "none":
             deadline = None
             
+        await task_storage.acquire_lock()
         task_storage.add_task(
             text=text,
             priority=priority,
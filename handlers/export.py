@@ -0,0 +1,42 @@
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, FSInputFile
+from services.exporter import EXPORT_FORMATS, load_export_data, write_export
+from datetime import datetime
+import asyncio
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+@router.message(Command("export"))
+async def cmd_export(message: Message, command: CommandObject):
+    """Выгружает задачи, цели, расписание и настроение в CSV, JSONL или HTML."""
+    fmt = (command.args or "csv").strip().lower()
+    if fmt not in EXPORT_FORMATS:
+        await message.answer(
+            "Использование: /export [формат]\n"
+            f"Доступные форматы: {', '.join(EXPORT_FORMATS)}"
+        )
+        return
+
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}.gz")
+    os.close(fd)
+    try:
+        # Данные читаются здесь, а в поток уходят готовые списки:
+        # кодирование и сжатие не трогают хранилище
+        data = load_export_data()
+        await asyncio.to_thread(write_export, fmt, path, data)
+        filename = f"export_{datetime.now().strftime('%Y-%m-%d')}.{fmt}.gz"
+        await message.answer_document(
+            document=FSInputFile(path, filename=filename),
+            caption=f"📦 Экспорт данных ({fmt.upper()}, gzip)"
+        )
+    except Exception as e:
+        logger.error(f"Export failed: {e}")
+        await message.answer(f"❌ Произошла ошибка при экспорте: {str(e)}")
+    finally:
+        os.unlink(path)
@@ -254,6 +254,7 @@ async def toggle_goal(callback: CallbackQuery, state: FSMContext):
     """Toggle the completion status of a goal."""
     try:
         goal_idx = int(callback.data.split(":")[1])
+        await goals_storage.acquire_lock()
         goals = goals_storage.get_goals()
         
         if not 0 <= goal_idx < len(goals):
@@ -275,6 +276,7 @@ async def delete_goal(callback: CallbackQuery, state: FSMContext):
     """Delete a goal."""
     try:
         goal_idx = int(callback.data.split(":")[1])
+        await goals_storage.acquire_lock()
         goals = goals_storage.get_goals()
         
         if not 0 <= goal_idx < len(goals):
@@ -338,6 +340,7 @@ async def receive_edited_text(message: Message, state: FSMContext):
     """Handle edited goal text."""
     data = await state.get_data()
     goal_idx = data["editing_goal_idx"]
+    await goals_storage.acquire_lock()
     goals = goals_storage.get_goals()
     
     goals[goal_idx]["text"] = message.text
@@ -372,6 +375,7 @@ async def receive_edited_priority(callback: CallbackQuery, state: FSMContext):
     goal_idx = data["editing_goal_idx"]
     priority = callback.data.split(":")[1]
     
+    await goals_storage.acquire_lock()
     goals = goals_storage.get_goals()
     goals[goal_idx]["priority"] = priority
     goals_storage.save_data(goals)
@@ -422,6 +426,7 @@ async def receive_edited_deadline(callback: CallbackQuery, state: FSMContext):
         goal_idx = int(parts[1])
         deadline = parts[2]
         
+        await goals_storage.acquire_lock()
         goals = goals_storage.get_goals()
         if not 0 <= goal_idx < len(goals):
             await callback.answer("Ошибка: цель не найдена", show_alert=True)
@@ -480,6 +485,7 @@ async def receive_deadline(callback: CallbackQuery, state: FSMContext):
         
         try:
             # Add the goal using storage method
+            await goals_storage.acquire_lock()
             goals_storage.add_goal(
                 text=state_data["text"],
                 priority=priority,
@@ -534,6 +540,7 @@ async def sort_goals(callback: CallbackQuery):
     """Sort goals based on selected criteria."""
     try:
         sort_type = callback.data.split(":")[1]
+        await goals_storage.acquire_lock()
         goals = goals_storage.get_goals()
         
         if sort_type == "priority":
@@ -1,6 +1,8 @@
 from aiogram import Router, F, Bot
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from services.storage import mood_storage
+from services.digest import digest
+from typing import List, Optional
 from datetime import datetime
 
 router = Router()
@@ -24,12 +26,10 @@ def generate_mood_keyboard():
         ]
     ])
 
-async def ask_mood(bot: Bot):
+async def ask_mood(bot: Bot, chat_ids: Optional[List[int]] = None):
     """Отправляет запрос на оценку настроения."""
     keyboard = generate_mood_keyboard()
-    # В реальном приложении здесь нужно получить список пользователей из базы данных
-    # await bot.send_message(chat_id=user_id, text="Как ваше настроение сегодня?", reply_markup=keyboard)
-    pass
+    digest.enqueue(chat_ids, "Как ваше настроение сегодня?", reply_markup=keyboard)
 
 @router.message(F.text == "😊 Настроение")
 async def show_mood(message: Message):
@@ -45,6 +45,7 @@ async def process_mood(callback: CallbackQuery):
             return
             
         # Сохраняем настроение
+        await mood_storage.acquire_lock()
         mood_storage.add_mood(mood_value)
         
         await callback.message.edit_reply_markup()
@@ -1,9 +1,11 @@
 from aiogram import Bot, Router, F
 from aiogram.types import Message
 from services.storage import TaskStorage, GoalStorage
+from services.digest import digest
 from config import settings
 from datetime import datetime, timedelta
 from collections import defaultdict
+from typing import List, Optional
 
 router = Router()
 task_storage = TaskStorage()
@@ -15,23 +17,19 @@ async def handle_progress(message: Message):
 
 # ---------- 📅 Отчёт по сегодняшним задачам и целям ----------
 
-async def send_checklist_report(bot: Bot):
+async def send_checklist_report(bot: Bot, chat_ids: Optional[List[int]] = None):
     tasks = task_storage.get_tasks()
     incomplete = [t for t in tasks if not t.get("completed") and not t.get("done")]
     
-    if not incomplete:
-        await bot.send_message(
-            chat_id=settings.USER_ID,
-            text="✅ Все задачи на сегодня выполнены!"
-        )
-        return
-
-    text = "📝 Невыполненные задачи на сегодня:\n\n"
-    text += "\n".join([f"🔲 {t['text']}" for t in incomplete])
+    if incomplete:
+        text = "📝 Невыполненные задачи на сегодня:\n\n"
+        text += "\n".join([f"🔲 {t['text']}" for t in incomplete])
+    else:
+        text = "✅ Все задачи на сегодня выполнены!"
 
-    await bot.send_message(settings.USER_ID, text)
+    digest.enqueue(chat_ids, text)
 
-async def send_goals_report(bot: Bot):
+async def send_goals_report(bot: Bot, chat_ids: Optional[List[int]] = None):
     goals = goal_storage.get_goals()
     active = [g for g in goals if not g.get("completed")]
 
@@ -41,7 +39,7 @@ async def send_goals_report(bot: Bot):
     else:
         text = "🎉 Все цели достигнуты! Пора ставить новые 🚀"
 
-    await bot.send_message(settings.USER_ID, text)
+    digest.enqueue(chat_ids, text)
 
 # ---------- 📈 Прогресс по команде "📈 Прогресс" ----------
 
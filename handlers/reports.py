@@ -1,49 +1,65 @@
 from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import Message, BufferedInputFile
-from services.report_generator import generate_full_report
-import os
+from services.report_pool import report_renderer
+from services.report_jobs import report_jobs, StageCallback
+from services.report_cache import report_cache
+from services.storage import get_data_snapshot
 from datetime import datetime
-from pathlib import Path
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = Router()
 
+REPORT_CAPTION = "📊 Сводный отчет по задачам, целям и продуктивности"
+
+async def build_and_send_report(message: Message, set_stage: StageCallback) -> None:
+    """Render (or reuse) the report and send it, reporting progress stages."""
+    now = datetime.now()
+    data = get_data_snapshot()
+    key = report_cache.make_key(data, now.date())
+
+    # Same data already uploaded: resend by file_id, no render or upload
+    file_id = report_cache.get_file_id(key)
+    if file_id:
+        await set_stage("sending")
+        try:
+            await message.answer_document(document=file_id, caption=REPORT_CAPTION)
+            return
+        except TelegramBadRequest as e:
+            logger.warning(f"Cached report file_id rejected, re-uploading: {e}")
+            report_cache.forget_file_id(key)
+
+    pdf_bytes = report_cache.get_pdf(key)
+    if pdf_bytes is None:
+        await set_stage("rendering")
+        # Render off the event loop, straight into memory
+        pdf_bytes = await report_renderer.render(data, now)
+        report_cache.put_pdf(key, pdf_bytes)
+
+    await set_stage("sending")
+    document = BufferedInputFile(
+        pdf_bytes,
+        filename=f"report_{now.strftime('%Y-%m-%d_%H-%M')}.pdf"
+    )
+    sent = await message.answer_document(document=document, caption=REPORT_CAPTION)
+    if sent.document:
+        report_cache.set_file_id(key, sent.document.file_id)
+
 async def generate_and_send_report(message: Message, user_id: int = None):
-    """Generate and send a productivity report."""
-    try:
-        # Create reports directory if it doesn't exist
-        reports_dir = Path("reports")
-        reports_dir.mkdir(exist_ok=True)
-        
-        # Generate report filename with timestamp
-        now = datetime.now().strftime("%Y-%m-%d_%H-%M")
-        user_id = user_id or message.from_user.id
-        report_filename = f"report_{user_id}_{now}.pdf"
-        report_path = reports_dir / report_filename
-        
-        # Generate the report
-        generate_full_report(str(report_path))
-        
-        # Read and send the file
-        if report_path.exists():
-            with open(report_path, 'rb') as file:
-                bytes_data = file.read()
-                document = BufferedInputFile(bytes_data, filename=f"report_{now}.pdf")
-                await message.answer_document(
-                    document=document,
-                    caption="📊 Сводный отчет по задачам, целям и продуктивности"
-                )
-            
-            # Clean up
-            report_path.unlink()
-            return True
-        else:
-            raise FileNotFoundError("Отчет не был создан")
-        
-    except Exception as e:
-        await message.answer(f"❌ Произошла ошибка при создании отчета: {str(e)}")
-        return False
+    """Generate and send a productivity report.
+
+    Repeated requests from the same user join the report already in flight.
+    """
+    user_id = user_id or message.from_user.id
+    return await report_jobs.submit(
+        user_id,
+        message,
+        lambda set_stage: build_and_send_report(message, set_stage)
+    )
 
 @router.message(F.text == "📊 Отчет")
 async def handle_report_command(message: Message):
     """Handle the report command."""
-    await generate_and_send_report(message) 
\ No newline at end of file
+    await generate_and_send_report(message)
@@ -8,6 +8,8 @@ import re
 import random
 import logging
 
+logger = logging.getLogger(__name__)
+
 router = Router()
 quotes = [
     "Самая длинная дорога начинается с первого шага. — Лао-цзы",
@@ -29,15 +31,17 @@ def generate_schedule_keyboard(schedule, show_controls=True):
     
     # Добавляем пункты расписания
     sorted_schedule = schedule_storage.get_sorted_schedule()
-    for i, entry in enumerate(sorted_schedule):
+    # Кнопки ссылаются на id записи: порядок на экране не совпадает с порядком хранения
+    for entry in sorted_schedule:
+        entry_id = entry["id"]
         time = entry.get("time", "00:00")
         task = entry.get("text", "")
         keyboard.extend([
-            [InlineKeyboardButton(text=f"🕒 {time} — {task}", callback_data=f"view_schedule_{i}")],
+            [InlineKeyboardButton(text=f"🕒 {time} — {task}", callback_data=f"sched_view:{entry_id}")],
             [
-                InlineKeyboardButton(text="✏️ Текст", callback_data=f"edit_text_{i}"),
-                InlineKeyboardButton(text="⏰ Время", callback_data=f"edit_time_{i}"),
-                InlineKeyboardButton(text="🗑️ Удалить", callback_data=f"delete_schedule_{i}")
+                InlineKeyboardButton(text="✏️ Текст", callback_data=f"sched_text:{entry_id}"),
+                InlineKeyboardButton(text="⏰ Время", callback_data=f"sched_time:{entry_id}"),
+                InlineKeyboardButton(text="🗑️ Удалить", callback_data=f"sched_delete:{entry_id}")
             ]
         ])
     
@@ -65,6 +69,7 @@ async def show_schedule(message: Message):
             return
         await message.answer("🗓️ Текущее расписание:", reply_markup=generate_schedule_keyboard(schedule))
     except Exception as e:
+        logger.exception("Schedule handler failed")
         await message.answer(f"❌ Произошла ошибка при загрузке расписания: {str(e)}")
 
 @router.callback_query(F.data == "schedule_add")
@@ -84,7 +89,8 @@ async def process_new_entry(message: Message, state: FSMContext):
             return
         
         time, description = match.groups()
-        schedule_storage.add_entry(time, description)
+        await schedule_storage.acquire_lock()
+        schedule_storage.add_entry(time, description, message.from_user.id)
         schedule = schedule_storage.get_schedule()
         
         await message.answer("✅ Пункт добавлен в расписание", reply_markup=generate_schedule_keyboard(schedule))
@@ -92,22 +98,21 @@ async def process_new_entry(message: Message, state: FSMContext):
     except ValidationError as e:
         await message.answer(f"❌ Ошибка: {str(e)}")
     except Exception as e:
+        logger.exception("Schedule handler failed")
         await message.answer(f"❌ Произошла ошибка: {str(e)}")
     finally:
         await state.clear()
 
-@router.callback_query(F.data.startswith("edit_text_"))
+@router.callback_query(F.data.startswith("sched_text:"))
 async def edit_schedule_text(callback: CallbackQuery, state: FSMContext):
-    index = int(callback.data.split("_")[-1])
-    await state.update_data(index=index)
+    await state.update_data(entry_id=callback.data.split(":", 1)[1])
     await state.set_state(ScheduleEdit.waiting_for_new_text)
     await callback.message.answer("✏️ Введите новый текст для этого пункта:")
     await callback.answer()
 
-@router.callback_query(F.data.startswith("edit_time_"))
+@router.callback_query(F.data.startswith("sched_time:"))
 async def edit_schedule_time(callback: CallbackQuery, state: FSMContext):
-    index = int(callback.data.split("_")[-1])
-    await state.update_data(index=index)
+    await state.update_data(entry_id=callback.data.split(":", 1)[1])
     await state.set_state(ScheduleEdit.waiting_for_new_time)
     await callback.message.answer("⏰ Введите новое время в формате ЧЧ:ММ (например, 09:00):")
     await callback.answer()
@@ -117,9 +122,8 @@ async def receive_schedule_text_update(message: Message, state: FSMContext):
     try:
         new_text = message.text.strip()
         data = await state.get_data()
-        index = data["index"]
-        
-        schedule_storage.update_entry_text(index, new_text)
+        await schedule_storage.acquire_lock()
+        schedule_storage.update_entry_text(data["entry_id"], new_text)
         schedule = schedule_storage.get_schedule()
         
         await message.answer("✅ Текст обновлен", reply_markup=generate_schedule_keyboard(schedule))
@@ -127,6 +131,7 @@ async def receive_schedule_text_update(message: Message, state: FSMContext):
     except ValidationError as e:
         await message.answer(f"❌ Ошибка: {str(e)}")
     except Exception as e:
+        logger.exception("Schedule handler failed")
         await message.answer(f"❌ Произошла ошибка: {str(e)}")
     finally:
         await state.clear()
@@ -136,9 +141,8 @@ async def receive_schedule_time_update(message: Message, state: FSMContext):
     try:
         new_time = message.text.strip()
         data = await state.get_data()
-        index = data["index"]
-        
-        schedule_storage.update_entry_time(index, new_time)
+        await schedule_storage.acquire_lock()
+        schedule_storage.update_entry_time(data["entry_id"], new_time)
         schedule = schedule_storage.get_schedule()
         
         await message.answer("✅ Время обновлено", reply_markup=generate_schedule_keyboard(schedule))
@@ -146,15 +150,16 @@ async def receive_schedule_time_update(message: Message, state: FSMContext):
     except ValidationError as e:
         await message.answer(f"❌ Ошибка: {str(e)}")
     except Exception as e:
+        logger.exception("Schedule handler failed")
         await message.answer(f"❌ Произошла ошибка: {str(e)}")
     finally:
         await state.clear()
 
-@router.callback_query(F.data.startswith("delete_schedule_"))
+@router.callback_query(F.data.startswith("sched_delete:"))
 async def delete_schedule_entry(callback: CallbackQuery):
     try:
-        index = int(callback.data.split("_")[-1])
-        deleted = schedule_storage.delete_entry(index)
+        await schedule_storage.acquire_lock()
+        deleted = schedule_storage.delete_entry(callback.data.split(":", 1)[1])
         schedule = schedule_storage.get_schedule()
         
         await callback.message.edit_reply_markup(reply_markup=generate_schedule_keyboard(schedule))
@@ -162,6 +167,7 @@ async def delete_schedule_entry(callback: CallbackQuery):
     except ValidationError as e:
         await callback.answer(f"❌ Ошибка: {str(e)}", show_alert=True)
     except Exception as e:
+        logger.exception("Schedule handler failed")
         await callback.answer(f"❌ Произошла ошибка: {str(e)}", show_alert=True)
 
 @router.callback_query(F.data == "schedule_refresh")
@@ -171,110 +177,20 @@ async def refresh_schedule(callback: CallbackQuery):
         await callback.message.edit_reply_markup(reply_markup=generate_schedule_keyboard(schedule))
         await callback.answer("🔄 Расписание обновлено")
     except Exception as e:
+        logger.exception("Schedule handler failed")
         await callback.answer(f"❌ Произошла ошибка: {str(e)}", show_alert=True)
 
-@router.callback_query(F.data.startswith("view_schedule_"))
+@router.callback_query(F.data.startswith("sched_view:"))
 async def view_schedule_entry(callback: CallbackQuery):
     try:
-        index = int(callback.data.split("_")[-1])
-        schedule = schedule_storage.get_schedule()
-        
-        if 0 <= index < len(schedule):
-            entry = schedule[index]
+        entry = schedule_storage.get_entry(callback.data.split(":", 1)[1])
+        if entry is not None:
             await callback.answer(
                 f"🕒 {entry['time']}\n📝 {entry['text']}",
                 show_alert=True
             )
         else:
-            await callback.answer("❌ Ошибка: неправильный индекс", show_alert=True)
+            await callback.answer("❌ Запись не найдена", show_alert=True)
     except Exception as e:
+        logger.exception("Schedule handler failed")
         await callback.answer(f"❌ Произошла ошибка: {str(e)}", show_alert=True)
-
-@router.callback_query(F.data.startswith("delete_schedule:"))
-async def delete_schedule_entry(callback: CallbackQuery, state: FSMContext):
-    """Delete a schedule entry."""
-    try:
-        entry_idx = int(callback.data.split(":")[1])
-        schedule = schedule_storage.get_schedule()
-        
-        if not 0 <= entry_idx < len(schedule):
-            await callback.answer("Ошибка: запись не найдена", show_alert=True)
-            return
-            
-        schedule_storage.delete_entry(entry_idx)
-        
-        # Получаем обновленное расписание и генерируем новую клавиатуру
-        updated_schedule = schedule_storage.get_schedule()
-        keyboard, message_text = generate_schedule_keyboard(updated_schedule)
-        
-        await callback.message.edit_text(text=message_text, reply_markup=keyboard)
-        await callback.answer("Запись удалена")
-    except Exception as e:
-        logger.error(f"Error in delete_schedule_entry: {str(e)}")
-        await callback.answer("Произошла ошибка при удалении записи", show_alert=True)
-
-@router.callback_query(F.data.startswith("edit_schedule:"))
-async def start_edit_schedule(callback: CallbackQuery, state: FSMContext):
-    """Start editing a schedule entry."""
-    try:
-        entry_idx = int(callback.data.split(":")[1])
-        schedule = schedule_storage.get_schedule()
-        
-        if not 0 <= entry_idx < len(schedule):
-            await callback.answer("Ошибка: запись не найдена", show_alert=True)
-            return
-            
-        entry = schedule[entry_idx]
-        await state.update_data(editing_entry_idx=entry_idx)
-        
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [
-                InlineKeyboardButton(text="✏️ Изменить текст", callback_data=f"edit_schedule_text:{entry_idx}"),
-                InlineKeyboardButton(text="⏰ Изменить время", callback_data=f"edit_schedule_time:{entry_idx}")
-            ],
-            [
-                InlineKeyboardButton(text="❌ Отмена", callback_data="show_schedule")
-            ]
-        ])
-        
-        await callback.message.edit_text(
-            text=f"Редактирование записи:\n{entry['time']} - {entry['text']}",
-            reply_markup=keyboard
-        )
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Error in start_edit_schedule: {str(e)}")
-        await callback.answer("Произошла ошибка при начале редактирования", show_alert=True)
-
-@router.callback_query(F.data == "show_schedule")
-async def show_schedule(callback: CallbackQuery, state: FSMContext):
-    """Show the schedule."""
-    try:
-        schedule = schedule_storage.get_schedule()
-        keyboard, message_text = generate_schedule_keyboard(schedule)
-        await callback.message.edit_text(text=message_text, reply_markup=keyboard)
-        await callback.answer()
-        await state.clear()
-    except Exception as e:
-        logger.error(f"Error in show_schedule: {str(e)}")
-        await callback.answer("Произошла ошибка при отображении расписания", show_alert=True)
-
-@router.callback_query(F.data.startswith("schedule_sort:"))
-async def sort_schedule(callback: CallbackQuery):
-    """Sort schedule entries based on selected criteria."""
-    try:
-        sort_type = callback.data.split(":")[1]
-        schedule = schedule_storage.get_schedule()
-        
-        if sort_type == "time":
-            schedule.sort(key=lambda x: x.get("time", "00:00"))
-        elif sort_type == "date":
-            schedule.sort(key=lambda x: x.get("created_at", ""))
-        
-        schedule_storage.save_data(schedule)
-        keyboard, message_text = generate_schedule_keyboard(schedule)
-        await callback.message.edit_text(text=message_text, reply_markup=keyboard)
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Error in sort_schedule: {str(e)}")
-        await callback.answer("Произошла ошибка при сортировке расписания", show_alert=True)
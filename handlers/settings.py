@@ -1,6 +1,11 @@
 from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from handlers.reports import generate_and_send_report
+from services.storage import user_storage
+from services.digest import parse_quiet_hours
+from config import settings
+import pytz
 import os
 
 router = Router()
@@ -29,4 +34,62 @@ async def handle_report_generation(callback: CallbackQuery):
         await generate_and_send_report(callback.message, callback.from_user.id)
     finally:
         # Remove the inline keyboard
-        await callback.message.edit_reply_markup(reply_markup=None)
\ No newline at end of file
+        await callback.message.edit_reply_markup(reply_markup=None)
+
+@router.message(Command("timezone"))
+async def set_timezone(message: Message, command: CommandObject):
+    """Показывает или меняет часовой пояс для рассылок."""
+    user_id = message.from_user.id
+    if not command.args:
+        user = user_storage.get_user(user_id) or {}
+        await message.answer(
+            f"🕒 Ваш часовой пояс: {user.get('timezone') or settings.TZ}\n"
+            "Чтобы изменить, отправьте /timezone Europe/Berlin"
+        )
+        return
+
+    timezone = command.args.strip()
+    if timezone not in pytz.all_timezones_set:
+        await message.answer("❌ Неизвестный часовой пояс. Пример: /timezone Asia/Yekaterinburg")
+        return
+
+    await user_storage.acquire_lock()
+    user_storage.touch_user(user_id, message.chat.id)
+    # Расписание рассылок и напоминаний пересчитывается по событию хранилища
+    user_storage.set_timezone(user_id, timezone)
+    await message.answer(f"✅ Часовой пояс изменен на {timezone}. Напоминания придут по местному времени.")
+
+@router.message(Command("quiet"))
+async def set_quiet_hours(message: Message, command: CommandObject):
+    """Показывает или меняет тихие часы, в которые уведомления откладываются."""
+    user_id = message.from_user.id
+    if not command.args:
+        user = user_storage.get_user(user_id) or {}
+        quiet_hours = user.get("quiet_hours")
+        current = f"{quiet_hours['start']}-{quiet_hours['end']}" if quiet_hours else "не заданы"
+        await message.answer(
+            f"🌙 Тихие часы: {current}\n"
+            "Чтобы изменить, отправьте /quiet 22:00-08:00, чтобы отключить — /quiet off"
+        )
+        return
+
+    args = command.args.strip().lower()
+    if args == "off":
+        quiet_hours = None
+    else:
+        try:
+            quiet_hours = parse_quiet_hours(args)
+        except ValueError as e:
+            await message.answer(f"❌ {e}. Пример: /quiet 22:00-08:00")
+            return
+
+    await user_storage.acquire_lock()
+    user_storage.touch_user(user_id, message.chat.id)
+    user_storage.set_quiet_hours(user_id, quiet_hours)
+    if quiet_hours:
+        await message.answer(
+            f"✅ Тихие часы: {quiet_hours['start']}-{quiet_hours['end']}. "
+            "Уведомления за это время придут одной сводкой после их окончания."
+        )
+    else:
+        await message.answer("✅ Тихие часы отключены")
@@ -1,147 +1,184 @@
 from aiohttp import web
-import logging
 from redis import asyncio as aioredis
 from config import settings
 import time
 import structlog
-from typing import Tuple, Optional
+from typing import Any, Dict, Tuple, Optional
 import asyncio
 import os
-from aiogram import Bot
+from services.startup import startup
+from services.redis_pool import redis_pool
+from services.keep_alive import KeepAliveService
 
 logger = structlog.get_logger()
 
 # Application state keys
 REDIS_CLIENT_KEY = web.AppKey('redis_client', aioredis.Redis)
-BOT_KEY = web.AppKey('bot', Bot)
-APP_STATE_KEY = web.AppKey('app_state', dict)
+KEEP_ALIVE_KEY = web.AppKey('keep_alive', KeepAliveService)
+
+# Telegram is failed after this many keep-alive pings in a row fail
+TELEGRAM_FAILURES = 2
 
 async def check_redis() -> Tuple[bool, str]:
-    """Check Redis connection with retries"""
-    max_retries = 3
-    retry_delay = 5
-    
-    for attempt in range(max_retries):
-        try:
-            redis = aioredis.from_url(
-                settings.REDIS_URL,
-                decode_responses=True,
-                retry_on_timeout=True,
-                health_check_interval=30,
-                socket_timeout=5.0,
-                socket_connect_timeout=5.0,
-                retry_on_error=[ConnectionError],
-                encoding='utf-8'
-            )
-            await redis.ping()
-            await redis.close()
-            return True, "OK"
-        except Exception as e:
-            logger.error("redis_health_check_failed", 
-                        error=str(e), 
-                        attempt=attempt + 1, 
-                        max_retries=max_retries)
-            if attempt < max_retries - 1:
-                await asyncio.sleep(retry_delay)
-            else:
-                return False, str(e)
-
-async def check_telegram(bot) -> Tuple[bool, str]:
-    """Check Telegram connection with retries"""
-    max_retries = 3
-    retry_delay = 5
-    
-    for attempt in range(max_retries):
-        try:
-            await bot.get_me()
-            return True, "OK"
-        except Exception as e:
-            logger.error("telegram_health_check_failed", 
-                        error=str(e), 
-                        attempt=attempt + 1, 
-                        max_retries=max_retries)
-            if attempt < max_retries - 1:
-                await asyncio.sleep(retry_delay)
-            else:
-                return False, str(e)
-
-def setup_health_check(app: web.Application, bot: Optional[Bot] = None) -> None:
-    """Setup health check endpoint"""
-    app_state = {
-        'startup_time': time.time(),
-        'last_check_time': time.time(),
-        'status': 'STARTING',
-        'bot_info': None,
-        'redis_status': 'unknown',
-        'initialization_complete': False
-    }
-    
-    async def health_check(request: web.Request) -> web.Response:
-        try:
-            current_time = time.time()
-            uptime = current_time - app_state['startup_time']
-            
-            # If we're still in startup phase, return 503
-            if not app_state['initialization_complete'] and uptime < 120:  # 2 minute grace period
-                return web.json_response({
-                    'status': 'STARTING',
-                    'message': 'Application is initializing',
-                    'uptime': uptime,
-                    'startup_time': app_state['startup_time']
-                }, status=503)
-            
-            # Update bot info if available
-            if bot and not app_state['bot_info']:
-                try:
-                    app_state['bot_info'] = await bot.get_me()
-                    app_state['status'] = 'READY'
-                except Exception as e:
-                    logger.error("Failed to get bot info", error=str(e))
-                    app_state['status'] = 'DEGRADED'
-            
-            # Check Redis connection if available
-            redis_client = request.app.get(REDIS_CLIENT_KEY)
-            if redis_client:
+    """Check Redis through the shared connection pool"""
+    if redis_pool.client is None:
+        return False, "not connected"
+    await redis_pool.client.ping()
+    return True, "OK"
+
+def telegram_status(keep_alive: KeepAliveService) -> Optional[Dict[str, Any]]:
+    """
+    Bot API status from the keep-alive pings, without a getMe of our own.
+    One failed ping is reported but stays ok; None until the first ping
+    """
+    now = time.time()
+    # The keep-alive loop pings every KEEP_ALIVE_INTERVAL; a much older success means it is stuck
+    stale_after = settings.KEEP_ALIVE_INTERVAL * 2 + settings.KEEP_ALIVE_TIMEOUT
+    if keep_alive.last_ok is None and keep_alive.failures == 0:
+        return None
+    age = None if keep_alive.last_ok is None else round(now - keep_alive.last_ok, 1)
+    result: Dict[str, Any] = {'status': 'ok', 'detail': f"@{keep_alive.username}", 'age': age, 'checked_at': now}
+    if keep_alive.last_error:
+        result.update(failures=keep_alive.failures, last_error=keep_alive.last_error)
+    if keep_alive.failures >= TELEGRAM_FAILURES or age is None or age > stale_after:
+        result['status'] = 'error'
+        result['error'] = keep_alive.last_error or f"no successful ping for {age}s"
+    return result
+
+class HealthProber:
+    """
+    Background probe of Redis; the Bot API status comes from the keep-alive
+    service. Health endpoints serve the cached result, so probes from the
+    platform cost no network calls
+    """
+
+    def __init__(self, app: web.Application, interval: float, timeout: float):
+        self.app = app
+        self.interval = interval
+        self.timeout = timeout
+        # A result older than three intervals means the prober is stuck
+        self.stale_after = interval * 3
+        self.components: Dict[str, Dict[str, Any]] = {}
+        self.last_probe: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._refresh: Optional[asyncio.Future] = None
+
+    async def start(self, app: web.Application) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self, app: web.Application) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            if startup.ready:
                 try:
-                    await redis_client.ping()
-                    app_state['redis_status'] = 'connected'
+                    await self.refresh()
                 except Exception as e:
-                    app_state['redis_status'] = 'error'
-                    app_state['status'] = 'DEGRADED'
-                    logger.error("Redis health check failed", error=str(e))
-            
-            # Update check time
-            app_state['last_check_time'] = current_time
-            
-            # Prepare response
-            response = {
-                'status': app_state['status'],
-                'uptime': uptime,
-                'last_check': app_state['last_check_time'],
-                'bot_info': str(app_state['bot_info']) if app_state['bot_info'] else None,
-                'redis_status': app_state['redis_status'],
-                'environment': os.getenv('RAILWAY_ENVIRONMENT', 'development')
-            }
-            
-            # Set status code based on state
-            status_code = 200 if app_state['status'] == 'READY' else 503
-            
-            return web.json_response(response, status=status_code)
-            
+                    logger.error("Health probe failed", error=str(e))
+            await asyncio.sleep(self.interval)
+
+    async def refresh(self) -> None:
+        """Probe all components; concurrent callers share one probe"""
+        if self._refresh is None:
+            self._refresh = asyncio.ensure_future(self._probe_all())
+            self._refresh.add_done_callback(self._refresh_done)
+        await asyncio.shield(self._refresh)
+
+    def _refresh_done(self, future: asyncio.Future) -> None:
+        self._refresh = None
+
+    async def _probe_all(self) -> None:
+        checks = {}
+        if redis_pool.client is not None:
+            checks['redis'] = check_redis
+        results = dict(zip(checks, await asyncio.gather(*(self._probe(name, check) for name, check in checks.items()))))
+        keep_alive = self.app.get(KEEP_ALIVE_KEY)
+        telegram = telegram_status(keep_alive) if keep_alive is not None else None
+        if telegram is not None:
+            results['telegram'] = telegram
+        for name, result in results.items():
+            previous = self.components.get(name, {}).get('status')
+            if previous != result['status']:
+                log = logger.info if result['status'] == 'ok' else logger.error
+                log("Health component changed", component=name, status=result['status'], error=result.get('error'))
+            self.components[name] = result
+        self.last_probe = time.monotonic()
+
+    async def _probe(self, name: str, check) -> Dict[str, Any]:
+        started = time.monotonic()
+        try:
+            _, detail = await asyncio.wait_for(check(), self.timeout)
+            result = {'status': 'ok', 'detail': detail}
         except Exception as e:
-            logger.error("Health check failed", error=str(e))
-            return web.json_response({
-                'status': 'ERROR',
-                'error': str(e)
-            }, status=500)
+            result = {'status': 'error', 'error': str(e) or type(e).__name__}
+        result['latency_ms'] = round((time.monotonic() - started) * 1000, 1)
+        result['checked_at'] = time.time()
+        return result
+
+    def probe_age(self) -> Optional[float]:
+        if self.last_probe is None:
+            return None
+        return round(time.monotonic() - self.last_probe, 3)
+
+    def status(self) -> str:
+        if not startup.ready:
+            return 'FAILED' if startup.error else 'STARTING'
+        if any(component['status'] != 'ok' for component in self.components.values()):
+            return 'DEGRADED'
+        age = self.probe_age()
+        if age is None or age > self.stale_after:
+            return 'STALE'
+        return 'READY'
+
+PROBER_KEY = web.AppKey('health_prober', HealthProber)
+
+def setup_health_check(app: web.Application) -> None:
+    """Setup /livez, /readyz and /health (an alias of /readyz with details)"""
+    started_at = time.time()
+    prober = HealthProber(app, settings.HEALTH_CHECK_INTERVAL, settings.HEALTH_CHECK_TIMEOUT)
+    app[PROBER_KEY] = prober
+    app.on_startup.append(prober.start)
+    app.on_cleanup.append(prober.stop)
     
-    # Store app state using AppKey
-    app[APP_STATE_KEY] = app_state
+    async def livez(request: web.Request) -> web.Response:
+        """The process is up and its event loop answers"""
+        return web.json_response({
+            'status': 'ALIVE',
+            'uptime': time.time() - started_at,
+            'probe_age': prober.probe_age()
+        })
     
-    # Register health check route
-    app.router.add_route('GET', '/health', health_check)
+    async def readyz(request: web.Request) -> web.Response:
+        """Cached component status; 200 only when every component is ok"""
+        # The first request after startup does not wait a whole interval
+        if startup.ready and prober.last_probe is None:
+            await prober.refresh()
+        status = prober.status()
+        response = {
+            'status': status,
+            'stage': startup.stage,
+            'probe_age': prober.probe_age(),
+            'stale_after': prober.stale_after,
+            'components': prober.components
+        }
+        if request.path == '/health':
+            response.update({
+                'uptime': time.time() - started_at,
+                'startup': startup.snapshot(),
+                'redis': redis_pool.stats(),
+                'environment': os.getenv('RAILWAY_ENVIRONMENT', 'development')
+            })
+        return web.json_response(response, status=200 if status == 'READY' else 503)
     
-    # Mark initialization as complete after setup
-    app_state['initialization_complete'] = True
+    app.router.add_route('GET', '/livez', livez)
+    app.router.add_route('GET', '/readyz', readyz)
+    app.router.add_route('GET', '/health', readyz)
     
-    logger.info("Health check endpoint setup completed") 
\ No newline at end of file
+    logger.info("Health check endpoints setup completed")
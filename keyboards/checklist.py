@@ -49,6 +49,9 @@ class ChecklistKeyboard(BaseKeyboard):
                     "callback_data": f"delete_task:{task['text']}"
                 }])
             
+            # Кнопки массовых действий
+            buttons.extend(cls.generate_bulk_buttons())
+            
             # Кнопка добавления новой задачи
             buttons.append([{
                 "text": "➕ Добавить задачу",
@@ -60,6 +63,79 @@ class ChecklistKeyboard(BaseKeyboard):
             "reply_markup": cls.create_inline_keyboard(buttons)
         }
 
+    @classmethod
+    def get_bulk_keyboard(cls, tasks: list, selected: set) -> dict:
+        """
+        Создает клавиатуру режима множественного выбора
+        :param tasks: список задач
+        :param selected: id выбранных задач
+        :return: словарь с клавиатурой и текстом сообщения
+        """
+        buttons = []
+        text = f"☑️ Отметьте задачи и выберите действие.\n\nВыбрано: {len(selected)} из {len(tasks)}"
+        
+        # Кнопки ссылаются на id: список может измениться, пока идет выбор
+        for task in tasks:
+            mark = "☑️" if task["id"] in selected else "⬜️"
+            status = STATUS_ICONS["completed"] if task.get("completed", False) else STATUS_ICONS["pending"]
+            buttons.append([{
+                "text": f"{mark} {status} {task['text']}",
+                "callback_data": f"bulk_select:{task['id']}"
+            }])
+        
+        buttons.extend([
+            [{
+                "text": "☑️ Выбрать все",
+                "callback_data": "bulk_select:all"
+            }, {
+                "text": "⬜️ Снять выбор",
+                "callback_data": "bulk_select:none"
+            }],
+            [{
+                "text": f"{STATUS_ICONS['completed']} Выполнить",
+                "callback_data": "bulk_apply:complete"
+            }, {
+                "text": f"{ACTION_ICONS['delete']} Удалить",
+                "callback_data": "bulk_apply:delete"
+            }],
+            [{
+                "text": f"{PRIORITY_ICONS['high']} Высокий",
+                "callback_data": "bulk_apply:priority_high"
+            }, {
+                "text": f"{PRIORITY_ICONS['medium']} Средний",
+                "callback_data": "bulk_apply:priority_medium"
+            }, {
+                "text": f"{PRIORITY_ICONS['low']} Низкий",
+                "callback_data": "bulk_apply:priority_low"
+            }],
+            [{
+                "text": f"{ACTION_ICONS['back']} Готово",
+                "callback_data": "bulk_cancel"
+            }]
+        ])
+        
+        return {
+            "text": text,
+            "reply_markup": cls.create_inline_keyboard(buttons)
+        }
+
+    @classmethod
+    def generate_bulk_buttons(cls) -> List[List[Dict[str, str]]]:
+        """Генерирует кнопки массовых действий"""
+        return [
+            [{
+                "text": "☑️ Выбрать несколько",
+                "callback_data": "bulk_mode"
+            }],
+            [{
+                "text": f"{STATUS_ICONS['completed']} Выполнить все",
+                "callback_data": "complete_all"
+            }, {
+                "text": "🧹 Очистить выполненные",
+                "callback_data": "clear_completed"
+            }]
+        ]
+
     @classmethod
     def get_main_keyboard(cls) -> dict:
         """
@@ -123,6 +199,10 @@ class ChecklistKeyboard(BaseKeyboard):
                 }]
             ])
         
+        # Добавляем кнопки массовых действий
+        if tasks:
+            buttons.extend(cls.generate_bulk_buttons())
+        
         # Добавляем кнопку добавления
         buttons.append([{
             "text": f"{ACTION_ICONS['add']} Добавить задачу",
@@ -1,7 +1,10 @@
 import logging
 import os
+import sys
 from logging.handlers import RotatingFileHandler
 
+import structlog
+
 # Создаем директорию для логов, если её нет
 os.makedirs('logs', exist_ok=True)
 
@@ -25,4 +28,31 @@ logger.addHandler(file_handler)
 # Добавляем обработчик для вывода в консоль
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(formatter)
-logger.addHandler(console_handler) 
\ No newline at end of file
+logger.addHandler(console_handler)
+
+def configure_logging(level: str = 'INFO', fmt: str = 'json') -> None:
+    """
+    Единая настройка логирования процесса: стандартный logging и structlog
+    пишут в stdout с одним уровнем. Вызывается один раз из config
+    """
+    log_level = logging.getLevelName(str(level).upper())
+    if not isinstance(log_level, int):
+        log_level = logging.INFO
+    logging.basicConfig(
+        level=log_level,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        stream=sys.stdout
+    )
+    renderer = structlog.processors.JSONRenderer() if fmt == 'json' else structlog.dev.ConsoleRenderer(colors=False)
+    structlog.configure(
+        processors=[
+            structlog.processors.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.format_exc_info,
+            renderer
+        ],
+        wrapper_class=structlog.make_filtering_bound_logger(log_level),
+        context_class=dict,
+        logger_factory=structlog.PrintLoggerFactory(sys.stdout),
+        cache_logger_on_first_use=True,
+    )
@@ -0,0 +1,44 @@
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+import time
+from services.metrics import HANDLER_SECONDS, TELEGRAM_SECONDS
+from services.tracing import span
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Время работы хендлера по модулю и имени функции"""
+
+    async def __call__(self, handler, event, data):
+        callback = getattr(data.get("handler"), "callback", None)
+        module = getattr(callback, "__module__", "unknown")
+        name = getattr(callback, "__name__", "unknown")
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            with span("handler", handler=f"{module}.{name}"):
+                return await handler(event, data)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            HANDLER_SECONDS.observe(
+                time.perf_counter() - started,
+                event=type(event).__name__,
+                module=module,
+                handler=name,
+                status=status
+            )
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Задержка запросов к Bot API; регистрируется после очереди отправки, чтобы не учитывать ожидание в ней"""
+
+    async def __call__(self, make_request, bot, method):
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            with span("telegram", method=type(method).__name__):
+                return await make_request(bot, method)
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            TELEGRAM_SECONDS.observe(time.perf_counter() - started, method=type(method).__name__, status=status)
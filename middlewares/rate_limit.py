@@ -1,23 +1,93 @@
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from collections import OrderedDict
 import time
 import logging
 from config import settings
+from services.metrics import RATE_LIMITED
+from services.throttling import TokenBucket
+from services.tracing import span
 
 logger = logging.getLogger(__name__)
 
+# GCRA: ключ хранит теоретическое время следующего запроса (TAT) в мс по часам Redis.
+# Возвращает 0, если запрос разрешен, иначе через сколько миллисекунд можно снова
+GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+if now < tat - tolerance then
+    return math.ceil(tat - tolerance - now)
+end
+local new_tat = tat + interval
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+return 0
+"""
+
+# Сколько пользователей помнить локально (ведра на время недоступности Redis, предупреждения)
+LOCAL_USERS_MAX = 10000
+
 class RateLimitMiddleware(BaseMiddleware):
-    def __init__(self, redis: aioredis.Redis, rate_limit: int = 20, period: int = 60):
+    """
+    Не более rate_limit событий пользователя за period секунд, с запасом
+    rate_limit подряд. Проверка — один вызов скрипта в Redis; пока Redis
+    недоступен, работают локальные ведра токенов процесса.
+    Ключи с разными key_prefix считаются независимо
+    """
+
+    def __init__(self, redis: aioredis.Redis, rate_limit: int = 20, period: int = 60,
+                 key_prefix: str = "rate_limit"):
         self.redis = redis
+        self.key_prefix = key_prefix
         self.rate_limit = rate_limit
         self.period = period
+        self._script = redis.register_script(GCRA_SCRIPT)
+        # Интервал между запросами и допустимый запас, мс
+        self._interval_ms = period * 1000 / rate_limit
+        self._tolerance_ms = period * 1000 - self._interval_ms
+        self._local: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        self._degraded = False
+        # До какого времени пользователь уже предупрежден, чтобы не отвечать на каждое лишнее сообщение
+        self._warned_until: "OrderedDict[int, float]" = OrderedDict()
+
+    async def check(self, user_id: int) -> float:
+        """Возвращает, через сколько секунд пользователю можно снова; 0 — можно сейчас"""
+        try:
+            with span("rate_limit"):
+                retry_ms = await self._script(keys=[f"{self.key_prefix}:{user_id}"], args=[self._interval_ms, self._tolerance_ms])
+        except RedisError as e:
+            if not self._degraded:
+                logger.warning(f"Rate limit falls back to local buckets, Redis failed: {e}")
+                self._degraded = True
+            return self._check_local(user_id)
+        if self._degraded:
+            logger.info("Rate limit uses Redis again")
+            self._degraded = False
+            self._local.clear()
+        return int(retry_ms) / 1000
+
+    def _check_local(self, user_id: int) -> float:
+        bucket = self._local.get(user_id)
+        if bucket is None:
+            bucket = self._local[user_id] = TokenBucket(self.rate_limit / self.period, self.rate_limit)
+            if len(self._local) > LOCAL_USERS_MAX:
+                self._local.popitem(last=False)
+        else:
+            self._local.move_to_end(user_id)
+        if bucket.try_acquire():
+            return 0.0
+        return bucket.delay()
 
     async def __call__(self, handler, event, data):
         # Get user ID from different types of updates
-        if isinstance(event, Message):
-            user_id = event.from_user.id
-        elif isinstance(event, CallbackQuery):
+        if isinstance(event, (Message, CallbackQuery)) and event.from_user:
             user_id = event.from_user.id
         else:
             return await handler(event, data)
@@ -26,23 +96,21 @@ class RateLimitMiddleware(BaseMiddleware):
         if user_id == settings.USER_ID:
             return await handler(event, data)
 
-        key = f"rate_limit:{user_id}"
-        
-        try:
-            current = await self.redis.incr(key)
-            if current == 1:
-                await self.redis.expire(key, self.period)
-                
-            if current > self.rate_limit:
-                logger.warning(f"Rate limit exceeded for user {user_id}")
-                if isinstance(event, Message):
-                    await event.answer("⚠️ Слишком много запросов. Пожалуйста, подождите.")
-                elif isinstance(event, CallbackQuery):
-                    await event.answer("⚠️ Слишком много запросов", show_alert=True)
-                return
-                
+        # The handler runs outside the check, so its errors never re-run it
+        retry_after = await self.check(user_id)
+        if retry_after <= 0:
             return await handler(event, data)
-            
-        except Exception as e:
-            logger.error(f"Rate limit error: {e}")
-            return await handler(event, data) 
\ No newline at end of file
+
+        RATE_LIMITED.inc(event="message" if isinstance(event, Message) else "callback_query")
+        if isinstance(event, CallbackQuery):
+            # На нажатие нужно ответить, иначе кнопка останется в состоянии загрузки
+            await event.answer("⚠️ Слишком много запросов", show_alert=True)
+            return
+        now = time.monotonic()
+        if now >= self._warned_until.get(user_id, 0.0):
+            logger.warning(f"Rate limit exceeded for user {user_id}")
+            self._warned_until[user_id] = now + retry_after
+            self._warned_until.move_to_end(user_id)
+            if len(self._warned_until) > LOCAL_USERS_MAX:
+                self._warned_until.popitem(last=False)
+            await event.answer("⚠️ Слишком много запросов. Пожалуйста, подождите.")
@@ -0,0 +1,15 @@
+from aiogram import BaseMiddleware
+from services.tracing import start_trace
+
+class TracingMiddleware(BaseMiddleware):
+    """Открывает корневой интервал трассировки на каждое обновление"""
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        with start_trace(
+            "update",
+            update_id=event.update_id,
+            type=event.event_type,
+            user_id=user.id if user else None
+        ):
+            return await handler(event, data)
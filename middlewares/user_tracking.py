@@ -0,0 +1,32 @@
+from aiogram import BaseMiddleware
+from aiogram.types import Message, CallbackQuery
+from services.storage import user_storage, StorageError
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class UserTrackingMiddleware(BaseMiddleware):
+    """Регистрирует пользователей и их последнюю активность"""
+
+    def __init__(self, touch_interval: int = 3600):
+        self.touch_interval = touch_interval
+        # Время последней записи по пользователю, чтобы не переписывать файл на каждое событие
+        self._last_touch = {}
+
+    async def __call__(self, handler, event, data):
+        if isinstance(event, (Message, CallbackQuery)) and event.from_user:
+            user_id = event.from_user.id
+            now = time.monotonic()
+            if now - self._last_touch.get(user_id, float("-inf")) >= self.touch_interval:
+                chat = event.chat if isinstance(event, Message) else (event.message.chat if event.message else None)
+                chat_id = chat.id if chat else None
+                try:
+                    # Новый пользователь попадает в расписание рассылок через событие хранилища
+                    await user_storage.acquire_lock()
+                    user_storage.touch_user(user_id, chat_id)
+                    self._last_touch[user_id] = now
+                except StorageError as e:
+                    logger.error(f"Failed to register user {user_id}: {e}")
+
+        return await handler(event, data)
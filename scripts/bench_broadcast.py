@@ -0,0 +1,145 @@
+"""
+Бенчмарк рассылки на локальном фейковом Bot API
+
+Сервер отвечает на sendMessage и, как настоящий Telegram, возвращает 429
+при превышении общего лимита или лимита на чат. Второй прогон прерывает
+рассылку на середине и продолжает ее, проверяя, что никто не получил
+сообщение дважды.
+
+Запуск из корня репозитория:
+    python scripts/bench_broadcast.py [--users 300] [--rate 30]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("BOT_TOKEN", "123456:bench")
+
+from aiohttp import web
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from services.broadcast import Broadcaster, OutboundMessage
+
+class FakeBotAPI:
+    """Фейковый Bot API с лимитами Telegram"""
+
+    def __init__(self, global_limit: int, chat_interval: float):
+        self.global_limit = global_limit
+        self.chat_interval = chat_interval
+        self.recent = deque()
+        self.chat_last = {}
+        self.delivered = Counter()
+        self.rejected = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        data = await request.post()
+        chat_id = int(data["chat_id"])
+        now = time.monotonic()
+        while self.recent and now - self.recent[0] > 1:
+            self.recent.popleft()
+        too_fast_for_chat = now - self.chat_last.get(chat_id, -self.chat_interval) < self.chat_interval * 0.9
+        if len(self.recent) >= self.global_limit or too_fast_for_chat:
+            self.rejected += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1}
+            })
+        self.recent.append(now)
+        self.chat_last[chat_id] = now
+        self.delivered[chat_id] += 1
+        return web.json_response({
+            "ok": True,
+            "result": {
+                "message_id": sum(self.delivered.values()),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": data.get("text", "")
+            }
+        })
+
+async def start_server(api: FakeBotAPI) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", api.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+def make_bot(runner: web.AppRunner) -> Bot:
+    host, port = runner.addresses[0][:2]
+    session = AiohttpSession(api=TelegramAPIServer.from_base(f"http://{host}:{port}"))
+    return Bot(token=os.environ["BOT_TOKEN"], session=session)
+
+def make_broadcaster(checkpoint_dir: str, args) -> Broadcaster:
+    return Broadcaster(
+        checkpoint_dir,
+        rate=args.rate,
+        chat_interval=1.0,
+        workers=args.workers,
+        max_retries=3
+    )
+
+async def run_full(args, messages) -> None:
+    api = FakeBotAPI(global_limit=30, chat_interval=1.0)
+    runner = await start_server(api)
+    bot = make_bot(runner)
+    try:
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            started = time.perf_counter()
+            result = await make_broadcaster(checkpoint_dir, args).send_messages(bot, "bench", messages)
+            elapsed = time.perf_counter() - started
+        print(
+            f"full run:   {result.sent} sent, {result.failed} failed in {elapsed:.2f}s "
+            f"({result.sent / elapsed:.1f} msg/s), 429 responses: {api.rejected}"
+        )
+    finally:
+        await bot.session.close()
+        await runner.cleanup()
+
+async def run_resume(args, messages) -> None:
+    api = FakeBotAPI(global_limit=30, chat_interval=1.0)
+    runner = await start_server(api)
+    bot = make_bot(runner)
+    try:
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            # Имитируем падение процесса посреди рассылки
+            task = asyncio.create_task(make_broadcaster(checkpoint_dir, args).send_messages(bot, "bench", messages))
+            while sum(api.delivered.values()) < len(messages) // 2:
+                await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            before = sum(api.delivered.values())
+
+            result = await make_broadcaster(checkpoint_dir, args).send_messages(bot, "bench", messages)
+        duplicates = sum(count - 1 for count in api.delivered.values() if count > 1)
+        print(
+            f"resume run: {before} sent before crash, {result.skipped} skipped and "
+            f"{result.sent} sent after restart, duplicates: {duplicates}, "
+            f"missing: {len(messages) - len(api.delivered)}"
+        )
+    finally:
+        await bot.session.close()
+        await runner.cleanup()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    messages = [OutboundMessage(chat_id, f"Сообщение {chat_id}") for chat_id in range(1, args.users + 1)]
+    asyncio.run(run_full(args, messages))
+    asyncio.run(run_resume(args, messages))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Бенчмарк раскладки текста отчета на документах из 10 000 строк
+
+Запуск из корня репозитория:
+    python scripts/bench_report_layout.py [--items 10000]
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from services.report_generator import PAGE_MARGIN, build_report_pdf, init_report_assets
+from services.report_layout import LayoutLine, get_layout, paginate
+
+WORDS = "задача цель отчет встреча проект план неделя звонок документ презентация".split()
+
+def make_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) + str(rng.randint(0, 500)) for _ in range(words))
+
+def naive_wrap(text, width, font_name, font_size):
+    """Прежний алгоритм: перемеряет всю растущую строку на каждом слове"""
+    lines, line = [], ''
+    for word in text.split():
+        test_line = line + ' ' + word if line else word
+        if pdfmetrics.stringWidth(test_line, font_name, font_size) < width:
+            line = test_line
+        else:
+            lines.append(line)
+            line = word
+    if line:
+        lines.append(line)
+    return lines
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<40} {time.perf_counter() - start:8.3f} s")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--words", type=int, default=40, help="слов в самом длинном пункте")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    texts = [make_text(rng, rng.randint(3, args.words)) for _ in range(args.items)]
+    font_name = init_report_assets()
+    width = A4[0] - 2 * PAGE_MARGIN
+
+    print(f"{args.items} items, font {font_name}")
+    timed("naive wrap (stringWidth per word)", lambda: [naive_wrap(t, width, font_name, 12) for t in texts])
+    layout = get_layout(font_name, 12)
+    wrapped = timed("memoized wrap", lambda: [line for t in texts for line in layout.wrap(t, width)])
+    lines = [LayoutLine(text, PAGE_MARGIN, 12) for text in wrapped]
+    pages = timed("paginate", lambda: paginate(lines, A4[1] - PAGE_MARGIN, PAGE_MARGIN, 20))
+    print(f"{len(lines)} lines on {len(pages)} pages")
+
+    data = {
+        "goals": [],
+        "tasks": [{"text": text, "completed": i % 3 == 0} for i, text in enumerate(texts)],
+        "moods": []
+    }
+    pdf = timed("full report render", lambda: build_report_pdf(data, datetime.now()))
+    print(f"PDF size: {len(pdf) / 1024:.0f} KiB")
+
+if __name__ == "__main__":
+    main()
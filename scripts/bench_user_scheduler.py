@@ -0,0 +1,92 @@
+"""
+Нагрузочный тест планировщика рассылок по часовым поясам
+
+Загружает 100 000 пользователей со случайными поясами и прогоняет неделю
+тиков по 30 секунд на симулированных часах. Проверяет, что каждый
+пользователь получил все рассылки ровно в свое местное время.
+
+Запуск из корня репозитория:
+    python scripts/bench_user_scheduler.py [--users 100000] [--days 7]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("BOT_TOKEN", "123456:bench")
+
+import pytz
+from datetime import time as daytime
+from services.user_scheduler import DailyJob, UserScheduler
+
+async def noop(bot, chat_ids):
+    pass
+
+JOBS = [
+    DailyJob("quote", (daytime(6, 0),), noop),
+    DailyJob("mood", (daytime(9, 0), daytime(14, 0), daytime(20, 0)), noop),
+    DailyJob("checklist", (daytime(21, 30),), noop),
+    DailyJob("goals", (daytime(21, 0),), noop, weekday=6)
+]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--tick", type=int, default=30)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    zones = sorted(pytz.common_timezones)
+    users = [
+        {"user_id": user_id, "chat_id": user_id, "timezone": rng.choice(zones)}
+        for user_id in range(1, args.users + 1)
+    ]
+    user_zones = {user["chat_id"]: pytz.timezone(user["timezone"]) for user in users}
+
+    scheduler = UserScheduler()
+    for job in JOBS:
+        scheduler.add_job(job)
+    start = datetime(2024, 3, 1, tzinfo=pytz.utc).timestamp()
+
+    started = time.perf_counter()
+    scheduler.load_users(users, now=start)
+    load_time = time.perf_counter() - started
+    print(f"load: {args.users} users, {scheduler.stats()['entries']} heap entries in {load_time:.2f}s")
+
+    fired = Counter()
+    wrong_time = 0
+    tick_times = []
+    now = start
+    end = start + args.days * 86400
+    while now < end:
+        now += args.tick
+        tick_started = time.perf_counter()
+        due = scheduler.collect_due(now)
+        tick_times.append(time.perf_counter() - tick_started)
+        for job_name, chat_ids in due.items():
+            fired[job_name] += len(chat_ids)
+            # Выборочно проверяем местное время срабатывания
+            for chat_id in chat_ids[:5]:
+                local = datetime.fromtimestamp(now, user_zones[chat_id])
+                job = scheduler.jobs[job_name]
+                if not any(0 <= (local.hour * 60 + local.minute) - (t.hour * 60 + t.minute) <= 1 for t in job.times):
+                    wrong_time += 1
+
+    tick_times.sort()
+    busy = [t for t in tick_times if t > 0.0001]
+    print(
+        f"ticks: {len(tick_times)}, total {sum(tick_times):.2f}s, "
+        f"p50 {tick_times[len(tick_times) // 2] * 1000:.3f}ms, max {tick_times[-1] * 1000:.1f}ms, "
+        f"busy ticks {len(busy)}"
+    )
+    print(f"fired: {dict(fired)}, {sum(fired.values()) / (args.users * args.days):.2f} per user per day")
+    print(f"wrong local time in sample: {wrong_time}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Проверка времени импорта
+
+Запускает `python -X importtime -c "import <module>"` отдельным процессом,
+печатает самые тяжелые импорты и собственные модули проекта и завершается
+с кодом 1, если импорт не уложился в бюджет, собственный модуль проекта
+импортируется слишком долго или загрузился модуль, которого при старте быть
+не должно (reportlab нужен только процессам рендеринга отчетов, APScheduler
+только основному процессу, а не обработчикам обновлений).
+
+Запуск из корня репозитория:
+    python scripts/check_import_time.py [--module main] [--budget 4] [--own-budget 0.05]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Пакеты проекта, время которых проверяется отдельно от зависимостей
+OWN_PACKAGES = ("config", "log", "health", "main", "handlers", "services", "middlewares", "keyboards", "states", "constants")
+
+# Модули, которые не должны загружаться при импорте
+FORBIDDEN = ("reportlab", "apscheduler")
+
+def measure(module: str) -> list:
+    """Возвращает [(модуль, собственное время, накопленное время)] в секундах"""
+    with tempfile.TemporaryDirectory() as workdir:
+        env = {**os.environ, "BOT_TOKEN": "123456:importtime", "PYTHONPATH": str(ROOT)}
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=workdir, env=env, capture_output=True, text=True
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return rows
+
+def is_own(name: str) -> bool:
+    return name.split(".")[0] in OWN_PACKAGES
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget", type=float, default=4.0, help="seconds for the whole import")
+    parser.add_argument("--own-budget", type=float, default=0.05, help="seconds of self time per project module")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = measure(args.module)
+    total = next(cumulative for name, _, cumulative in rows if name == args.module)
+    print(f"import {args.module}: {total:.3f}s (budget {args.budget:.1f}s)")
+
+    print("\nslowest imports by self time:")
+    for name, self_time, cumulative in sorted(rows, key=lambda row: row[1], reverse=True)[:args.top]:
+        print(f"  {self_time:8.3f}s  {cumulative:8.3f}s  {name}")
+
+    own = sorted((row for row in rows if is_own(row[0])), key=lambda row: row[1], reverse=True)
+    print("\nproject modules by self time:")
+    for name, self_time, cumulative in own[:args.top]:
+        print(f"  {self_time:8.3f}s  {cumulative:8.3f}s  {name}")
+
+    problems = []
+    if total > args.budget:
+        problems.append(f"import {args.module} took {total:.3f}s, over the {args.budget:.1f}s budget")
+    for name, self_time, _ in own:
+        if self_time > args.own_budget:
+            problems.append(f"{name} took {self_time:.3f}s of self time, over {args.own_budget:.3f}s")
+    loaded = {name.split(".")[0] for name, _, _ in rows}
+    for name in FORBIDDEN:
+        if name in loaded:
+            problems.append(f"{name} is loaded at import time")
+
+    if problems:
+        print("\nFAILED:")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("\nOK")
+
+if __name__ == "__main__":
+    main()
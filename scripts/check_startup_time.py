@@ -0,0 +1,125 @@
+"""
+Проверка времени запуска бота
+
+Запускает main.py отдельным процессом против локального фейкового Bot API
+и опрашивает /health, пока бот не станет готов. Печатает длительность
+каждого шага запуска и завершается с кодом 1, если запуск не уложился
+в бюджет. Нужен Redis на localhost:6379.
+
+Запуск из корня репозитория:
+    python scripts/check_startup_time.py [--budget 15] [--runs 3]
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def handle_api(request: web.Request) -> web.Response:
+    """Отвечает на методы, которые бот вызывает при запуске"""
+    method = request.match_info["method"].lower()
+    if method == "getme":
+        result = {"id": 123456, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+    elif method == "getwebhookinfo":
+        result = {"url": "", "has_custom_certificate": False, "pending_update_count": 0}
+    elif method == "getupdates":
+        # Long polling без обновлений
+        await asyncio.sleep(1)
+        result = []
+    else:
+        result = True
+    return web.json_response({"ok": True, "result": result})
+
+async def start_api() -> web.AppRunner:
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", handle_api)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+async def measure(api_url: str, timeout: float) -> dict:
+    """Запускает бота и возвращает время до первого успешного /health"""
+    port = free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        env = {
+            **os.environ,
+            "BOT_TOKEN": "123456:startup",
+            "TELEGRAM_API_URL": api_url,
+            "PORT": str(port),
+            "PYTHONPATH": str(ROOT),
+            "LOG_LEVEL": "WARNING"
+        }
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, str(ROOT / "main.py"),
+            cwd=workdir, env=env,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+        )
+        try:
+            async with aiohttp.ClientSession() as session:
+                while time.perf_counter() - started < timeout:
+                    if process.returncode is not None:
+                        raise RuntimeError(f"main.py exited with code {process.returncode}")
+                    try:
+                        async with session.get(f"http://127.0.0.1:{port}/health") as response:
+                            body = await response.json()
+                            if response.status == 200:
+                                return {"elapsed": time.perf_counter() - started, "startup": body["startup"]}
+                    except aiohttp.ClientError:
+                        pass
+                    await asyncio.sleep(0.05)
+            raise RuntimeError(f"Bot was not ready after {timeout:.0f}s")
+        finally:
+            if process.returncode is None:
+                process.send_signal(signal.SIGTERM)
+                try:
+                    await asyncio.wait_for(process.wait(), 15)
+                except asyncio.TimeoutError:
+                    process.kill()
+
+async def run(args) -> bool:
+    api = await start_api()
+    host, port = api.addresses[0][:2]
+    ok = True
+    try:
+        for run_number in range(1, args.runs + 1):
+            result = await measure(f"http://{host}:{port}", timeout=args.budget * 4)
+            steps = ", ".join(
+                f"{name} {step['duration']:.2f}s" for name, step in result["startup"]["steps"].items()
+            )
+            within = result["elapsed"] <= args.budget
+            ok = ok and within
+            print(
+                f"run {run_number}: ready in {result['elapsed']:.2f}s "
+                f"(in-process {result['startup']['duration']:.2f}s; {steps}) "
+                f"{'OK' if within else 'OVER BUDGET'}"
+            )
+    finally:
+        await api.cleanup()
+    return ok
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=15.0, help="seconds from process start to ready /health")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    if not asyncio.run(run(args)):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
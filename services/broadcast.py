@@ -0,0 +1,293 @@
+"""
+Рассылка сообщений всем пользователям с учетом лимитов Telegram
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramRetryAfter,
+    TelegramForbiddenError,
+    TelegramBadRequest,
+    TelegramNetworkError,
+    TelegramServerError
+)
+from aiogram.types import InlineKeyboardMarkup
+from config import settings
+from services.storage import user_storage
+from services.throttling import TokenBucket
+from services.outbound import use_lane
+
+logger = logging.getLogger(__name__)
+
+# Сколько дней хранить отметки о завершенных рассылках
+DONE_RETENTION_DAYS = 7
+
+@dataclass
+class OutboundMessage:
+    """Сообщение одному получателю"""
+    chat_id: int
+    text: str
+    reply_markup: Optional[InlineKeyboardMarkup] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "chat_id": self.chat_id,
+            "text": self.text,
+            "reply_markup": self.reply_markup.model_dump(exclude_none=True) if self.reply_markup else None
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "OutboundMessage":
+        markup = data.get("reply_markup")
+        return cls(
+            chat_id=data["chat_id"],
+            text=data["text"],
+            reply_markup=InlineKeyboardMarkup.model_validate(markup) if markup else None
+        )
+
+@dataclass
+class BroadcastResult:
+    """Итог рассылки"""
+    broadcast_id: str
+    sent: int = 0
+    failed: int = 0
+    skipped: int = 0
+
+def make_broadcast_id(kind: str, slot: float, batch: Iterable = ()) -> str:
+    """
+    Идентификатор рассылки по ее плановому слоту: повторный запуск того же
+    слота получает тот же id, и отметка .done не дает отправить его снова
+    :param slot: плановое время рассылки
+    :param batch: то, что отличает рассылки одного слота (например, чаты и их слоты)
+    """
+    broadcast_id = f"{kind}-{datetime.fromtimestamp(slot).strftime('%Y-%m-%d-%H%M%S')}"
+    batch = sorted(batch)
+    if batch:
+        broadcast_id += "-" + hashlib.sha1(repr(batch).encode()).hexdigest()[:12]
+    return broadcast_id
+
+def get_recipients() -> List[int]:
+    """Возвращает чаты всех зарегистрированных пользователей и администратора"""
+    chat_ids = [user.get("chat_id", user["user_id"]) for user in user_storage.get_users()]
+    if settings.USER_ID:
+        chat_ids.append(settings.USER_ID)
+    return list(dict.fromkeys(chat_ids))
+
+class Broadcaster:
+    """
+    Рассылка через пул воркеров с общим лимитом скорости и паузой между
+    сообщениями в один чат. Прогресс пишется в журнал, поэтому после падения
+    рассылка продолжается с места остановки, а не начинается заново
+    """
+
+    def __init__(
+        self,
+        checkpoint_dir: str,
+        rate: float,
+        chat_interval: float,
+        workers: int,
+        max_retries: int
+    ):
+        self.checkpoint_dir = Path(checkpoint_dir)
+        # Без запаса на всплеск: Telegram считает лимит в скользящем окне
+        self.bucket = TokenBucket(rate, capacity=1)
+        self.chat_interval = chat_interval
+        self.workers = workers
+        self.max_retries = max_retries
+        self._chat_next: Dict[int, float] = {}
+        self._paused_until = 0.0
+        self._active: Set[str] = set()
+
+    def _spec_path(self, broadcast_id: str) -> Path:
+        return self.checkpoint_dir / f"{broadcast_id}.json"
+
+    def _log_path(self, broadcast_id: str) -> Path:
+        return self.checkpoint_dir / f"{broadcast_id}.log"
+
+    def _done_path(self, broadcast_id: str) -> Path:
+        return self.checkpoint_dir / f"{broadcast_id}.done"
+
+    async def broadcast(
+        self,
+        bot: Bot,
+        broadcast_id: str,
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+        chat_ids: Optional[Iterable[int]] = None,
+        lane: str = "bulk"
+    ) -> BroadcastResult:
+        """Отправляет одинаковое сообщение всем пользователям или списку чатов"""
+        if chat_ids is None:
+            chat_ids = get_recipients()
+        messages = [OutboundMessage(chat_id, text, reply_markup) for chat_id in chat_ids]
+        return await self.send_messages(bot, broadcast_id, messages, lane)
+
+    async def send_messages(
+        self,
+        bot: Bot,
+        broadcast_id: str,
+        messages: List[OutboundMessage],
+        lane: str = "bulk"
+    ) -> BroadcastResult:
+        """
+        Рассылает сообщения с контрольными точками
+        :param broadcast_id: идентификатор рассылки; повторный запуск с тем же id
+            продолжает незавершенную рассылку и пропускает завершенную
+        :param messages: сообщения получателям
+        :param lane: полоса очереди исходящих запросов
+        :return: итог рассылки
+        """
+        done_path = self._done_path(broadcast_id)
+        if done_path.exists():
+            logger.info(f"Broadcast {broadcast_id} already completed, skipping")
+            return BroadcastResult(**json.loads(done_path.read_text(encoding="utf-8")))
+        if broadcast_id in self._active:
+            logger.info(f"Broadcast {broadcast_id} already running, skipping")
+            return BroadcastResult(broadcast_id)
+
+        self._active.add(broadcast_id)
+        try:
+            self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+            self._prune_done()
+            messages, processed, lane = self._load_checkpoint(broadcast_id, messages, lane)
+            result = BroadcastResult(broadcast_id, skipped=len(processed))
+            queue: asyncio.Queue = asyncio.Queue()
+            for index in range(len(messages)):
+                if index not in processed:
+                    queue.put_nowait(index)
+
+            if processed:
+                logger.info(f"Resuming broadcast {broadcast_id}: {queue.qsize()} of {len(messages)} left")
+            started = time.monotonic()
+
+            with open(self._log_path(broadcast_id), "a", encoding="utf-8") as log:
+                async def worker() -> None:
+                    while not queue.empty():
+                        index = queue.get_nowait()
+                        ok = await self._send_one(bot, messages[index])
+                        # Отметка пишется сразу, чтобы после падения не отправить повторно
+                        log.write(f"{index} {'sent' if ok else 'failed'}\n")
+                        log.flush()
+                        if ok:
+                            result.sent += 1
+                        else:
+                            result.failed += 1
+
+                # Воркеры наследуют полосу из контекста, в котором созданы
+                with use_lane(lane):
+                    await asyncio.gather(*(worker() for _ in range(min(self.workers, queue.qsize()))))
+
+            self._finish(result)
+            logger.info(
+                f"Broadcast {broadcast_id} finished in {time.monotonic() - started:.1f}s: "
+                f"{result.sent} sent, {result.failed} failed, {result.skipped} resumed"
+            )
+            return result
+        finally:
+            self._active.discard(broadcast_id)
+
+    async def resume_pending(self, bot: Bot) -> None:
+        """Продолжает рассылки, прерванные падением или перезапуском"""
+        if not self.checkpoint_dir.exists():
+            return
+        for spec_path in sorted(self.checkpoint_dir.glob("*.json")):
+            try:
+                await self.send_messages(bot, spec_path.stem, [])
+            except Exception as e:
+                logger.error(f"Failed to resume broadcast {spec_path.stem}: {e}")
+
+    def _load_checkpoint(
+        self,
+        broadcast_id: str,
+        messages: List[OutboundMessage],
+        lane: str
+    ) -> Tuple[List[OutboundMessage], Set[int], str]:
+        """Загружает незавершенную рассылку или сохраняет новую"""
+        spec_path = self._spec_path(broadcast_id)
+        if spec_path.exists():
+            spec = json.loads(spec_path.read_text(encoding="utf-8"))
+            messages = [OutboundMessage.from_dict(item) for item in spec["messages"]]
+            lane = spec.get("lane", lane)
+        else:
+            tmp_path = spec_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps({
+                "id": broadcast_id,
+                "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "lane": lane,
+                "messages": [message.to_dict() for message in messages]
+            }, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, spec_path)
+
+        processed = set()
+        log_path = self._log_path(broadcast_id)
+        if log_path.exists():
+            for line in log_path.read_text(encoding="utf-8").splitlines():
+                index, _, _ = line.partition(" ")
+                if index.isdigit():
+                    processed.add(int(index))
+        return messages, processed, lane
+
+    def _finish(self, result: BroadcastResult) -> None:
+        """Заменяет контрольную точку отметкой о завершении"""
+        self._done_path(result.broadcast_id).write_text(json.dumps(asdict(result)), encoding="utf-8")
+        self._spec_path(result.broadcast_id).unlink(missing_ok=True)
+        self._log_path(result.broadcast_id).unlink(missing_ok=True)
+
+    def _prune_done(self) -> None:
+        """Удаляет старые отметки о завершенных рассылках"""
+        cutoff = (datetime.now() - timedelta(days=DONE_RETENTION_DAYS)).timestamp()
+        for path in self.checkpoint_dir.glob("*.done"):
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+
+    async def _pace_chat(self, chat_id: int) -> None:
+        """Выдерживает интервал между сообщениями в один чат"""
+        now = time.monotonic()
+        if len(self._chat_next) > 10000:
+            self._chat_next = {chat: at for chat, at in self._chat_next.items() if at > now}
+        next_at = self._chat_next.get(chat_id, now)
+        # Слот резервируется до ожидания, поэтому воркеры не отправят в чат одновременно
+        self._chat_next[chat_id] = max(now, next_at) + self.chat_interval
+        if next_at > now:
+            await asyncio.sleep(next_at - now)
+
+    async def _send_one(self, bot: Bot, message: OutboundMessage) -> bool:
+        """Отправляет сообщение с повторами; возвращает True при успехе"""
+        for attempt in range(self.max_retries + 1):
+            # Flood control от Telegram приостанавливает всех воркеров
+            delay = self._paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.bucket.acquire()
+            await self._pace_chat(message.chat_id)
+            try:
+                await bot.send_message(message.chat_id, message.text, reply_markup=message.reply_markup)
+                return True
+            except TelegramRetryAfter as e:
+                logger.warning(f"Flood control on chat {message.chat_id}, pausing for {e.retry_after}s")
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                # Пользователь заблокировал бота или чат недоступен: повтор не поможет
+                logger.info(f"Skipping chat {message.chat_id}: {e}")
+                return False
+            except (TelegramNetworkError, TelegramServerError) as e:
+                logger.warning(f"Failed to send to chat {message.chat_id} (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(2 ** attempt)
+        logger.error(f"Giving up on chat {message.chat_id} after {self.max_retries + 1} attempts")
+        return False
+
+broadcaster = Broadcaster(
+    settings.BROADCASTS_DIR,
+    rate=settings.BROADCAST_RATE,
+    chat_interval=settings.BROADCAST_CHAT_INTERVAL,
+    workers=settings.BROADCAST_WORKERS,
+    max_retries=settings.BROADCAST_MAX_RETRIES
+)
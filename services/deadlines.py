@@ -0,0 +1,112 @@
+"""
+Напоминания о дедлайнах задач и целей
+"""
+import bisect
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from aiogram import Bot
+from services.storage import BaseStorage
+from services.digest import digest
+from services.user_scheduler import get_timezone
+
+logger = logging.getLogger(__name__)
+
+SOURCE_LABELS = {
+    "tasks": "✅",
+    "goals": "🎯"
+}
+
+class DueIndex:
+    """
+    Индекс незавершенных задач и целей по дате дедлайна.
+    Обновляется при каждом сохранении хранилища, поэтому утренней проверке
+    достаточно прочитать несколько корзин вместо всех файлов
+    """
+
+    def __init__(self):
+        # дата -> {(источник, id): запись}
+        self._buckets: Dict[str, Dict[Tuple[str, str], Dict[str, Any]]] = {}
+        # Даты непустых корзин по возрастанию (ISO-строки сортируются как даты)
+        self._dates: List[str] = []
+        # источник -> {id: дата}
+        self._deadlines: Dict[str, Dict[str, str]] = {}
+        self._listeners: Dict[str, Callable[[List[Dict[str, Any]]], None]] = {}
+
+    def attach(self, source: str, storage: BaseStorage) -> None:
+        """Строит индекс по хранилищу и подписывается на его сохранения"""
+        # Один подписчик на источник, даже если индекс перестраивается повторно
+        listener = self._listeners.setdefault(source, lambda items: self.update(source, items))
+        storage.add_save_listener(listener)
+        # id старым записям проставляются при запуске, здесь только чтение
+        self.update(source, storage.load_data())
+
+    def update(self, source: str, items: List[Dict[str, Any]]) -> None:
+        """Приводит корзины источника в соответствие с его записями"""
+        current = {
+            item["id"]: item
+            for item in items
+            if item.get("deadline") and not item.get("completed") and "id" in item
+        }
+        previous = self._deadlines.get(source, {})
+        for item_id, deadline in previous.items():
+            item = current.get(item_id)
+            if item is None or item["deadline"] != deadline:
+                bucket = self._buckets.get(deadline)
+                if bucket is not None:
+                    bucket.pop((source, item_id), None)
+                    if not bucket:
+                        del self._buckets[deadline]
+                        del self._dates[bisect.bisect_left(self._dates, deadline)]
+        for item_id, item in current.items():
+            bucket = self._buckets.get(item["deadline"])
+            if bucket is None:
+                bucket = self._buckets[item["deadline"]] = {}
+                bisect.insort(self._dates, item["deadline"])
+            bucket[(source, item_id)] = item
+        self._deadlines[source] = {item_id: item["deadline"] for item_id, item in current.items()}
+
+    def get_bucket(self, day: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Возвращает записи с дедлайном в указанный день"""
+        return [(source, item) for (source, _), item in self._buckets.get(day, {}).items()]
+
+    def get_overdue(self, day: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Возвращает записи из всех корзин раньше указанного дня, от старых к новым"""
+        return [
+            entry
+            for date in self._dates[:bisect.bisect_left(self._dates, day)]
+            for entry in self.get_bucket(date)
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает число корзин и записей в индексе"""
+        return {
+            "buckets": len(self._buckets),
+            "items": sum(len(deadlines) for deadlines in self._deadlines.values())
+        }
+
+due_index = DueIndex()
+
+def format_due_items(items: List[Tuple[str, Dict[str, Any]]]) -> str:
+    return "\n".join(f"{SOURCE_LABELS.get(source, '•')} {item['text']}" for source, item in items)
+
+def build_deadline_message(today: Optional[datetime] = None) -> Optional[str]:
+    """Собирает одно сообщение по просроченным, сегодняшней и завтрашней корзинам"""
+    today = (today or datetime.now(get_timezone(None))).date()
+    sections = [
+        ("🔥 Просрочено:", due_index.get_overdue(today.isoformat())),
+        ("📅 Срок сегодня:", due_index.get_bucket(today.isoformat())),
+        ("🗓 Срок завтра:", due_index.get_bucket((today + timedelta(days=1)).isoformat()))
+    ]
+    parts = [f"{title}\n{format_due_items(items)}" for title, items in sections if items]
+    if not parts:
+        return None
+    return "⏰ Дедлайны\n\n" + "\n\n".join(parts)
+
+async def send_deadline_reminders(bot: Bot, chat_ids: Optional[List[int]] = None):
+    """Рассылает напоминания о дедлайнах одним сообщением на пользователя"""
+    text = build_deadline_message()
+    if text is None:
+        logger.info("No deadlines due, skipping reminders")
+        return
+    digest.enqueue(chat_ids, text)
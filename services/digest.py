@@ -0,0 +1,218 @@
+"""
+Сводки уведомлений: несколько плановых сообщений пользователю за короткое
+окно объединяются в одно, а в тихие часы откладываются до их окончания
+"""
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup
+from config import settings
+from services.broadcast import broadcaster, make_broadcast_id, get_recipients, OutboundMessage
+from services.user_scheduler import get_timezone
+
+logger = logging.getLogger(__name__)
+
+# Лимит Telegram на длину сообщения с запасом
+MAX_MESSAGE_LENGTH = 4000
+SEPARATOR = "\n\n———\n\n"
+
+def parse_quiet_hours(value: str) -> Dict[str, str]:
+    """Разбирает строку вида 22:00-08:00"""
+    start, sep, end = value.replace(" ", "").partition("-")
+    if not sep:
+        raise ValueError("Укажите интервал в формате ЧЧ:ММ-ЧЧ:ММ")
+    for part in (start, end):
+        try:
+            datetime.strptime(part, "%H:%M")
+        except ValueError:
+            raise ValueError(f"Неверное время {part}, используйте ЧЧ:ММ")
+    if start == end:
+        raise ValueError("Начало и конец тихих часов совпадают")
+    return {"start": start, "end": end}
+
+def quiet_until(quiet_hours: Optional[Dict[str, str]], timezone: Optional[str], now: float) -> Optional[float]:
+    """Возвращает момент окончания тихих часов, если now попадает в них"""
+    if not quiet_hours:
+        return None
+    tz = get_timezone(timezone)
+    local = datetime.fromtimestamp(now, tz)
+    start = datetime.strptime(quiet_hours["start"], "%H:%M").time()
+    end = datetime.strptime(quiet_hours["end"], "%H:%M").time()
+    current = local.time()
+    if start < end:
+        quiet = start <= current < end
+        end_day = local.date()
+    else:
+        # Интервал переходит через полночь
+        quiet = current >= start or current < end
+        end_day = local.date() if current < end else local.date() + timedelta(days=1)
+    if not quiet:
+        return None
+    return tz.localize(datetime.combine(end_day, end)).timestamp()
+
+def split_text(text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """Делит текст на части не длиннее limit, по возможности по переводам строк"""
+    parts: List[str] = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit + 1)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    parts.append(text)
+    return parts
+
+def merge_notifications(chat_id: int, items: List[Dict[str, Any]]) -> List[OutboundMessage]:
+    """Склеивает уведомления в минимальное число сообщений"""
+    messages: List[OutboundMessage] = []
+    texts: List[str] = []
+    markup: Optional[Dict[str, Any]] = None
+
+    def flush() -> None:
+        nonlocal texts, markup
+        # Клавиатура уходит с тем сообщением, в котором текст ее уведомления
+        messages.append(OutboundMessage(
+            chat_id,
+            SEPARATOR.join(texts),
+            InlineKeyboardMarkup.model_validate(markup) if markup else None
+        ))
+        texts = []
+        markup = None
+
+    for item in items:
+        item_markup = item.get("reply_markup")
+        # У сообщения одна клавиатура: уведомление с другой начинает новое сообщение
+        if item_markup and markup is not None and item_markup != markup:
+            flush()
+        for part in split_text(item["text"]):
+            if texts and len(SEPARATOR.join(texts + [part])) > MAX_MESSAGE_LENGTH:
+                flush()
+            texts.append(part)
+        if item_markup:
+            # Кнопки под последней частью текста
+            markup = item_markup
+    if texts:
+        flush()
+    return messages
+
+class DigestBuffer:
+    """Буфер уведомлений по чатам с отложенной отправкой"""
+
+    def __init__(self, path: str, window: int):
+        self.path = Path(path)
+        self.window = window
+        self._pending: Dict[int, List[Dict[str, Any]]] = {}
+        self._due: Dict[int, float] = {}
+        # chat_id -> (часовой пояс, тихие часы)
+        self._prefs: Dict[int, tuple] = {}
+        self.enqueued = 0
+        self.sent = 0
+
+    def load(self) -> None:
+        """Восстанавливает отложенные уведомления после перезапуска"""
+        try:
+            state = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load digest buffer: {e}")
+            return
+        self._pending = {int(chat_id): items for chat_id, items in state.get("pending", {}).items()}
+        self._due = {int(chat_id): due for chat_id, due in state.get("due", {}).items()}
+        logger.info(f"Digest buffer restored for {len(self._pending)} chats")
+
+    def load_prefs(self, users: Iterable[Dict[str, Any]]) -> None:
+        """Запоминает часовые пояса и тихие часы пользователей"""
+        self._prefs = {
+            user.get("chat_id", user["user_id"]): (user.get("timezone"), user.get("quiet_hours"))
+            for user in users
+        }
+
+    def set_prefs(self, chat_id: int, timezone: Optional[str], quiet_hours: Optional[Dict[str, str]]) -> None:
+        self._prefs[chat_id] = (timezone, quiet_hours)
+
+    def enqueue(
+        self,
+        chat_ids: Optional[Iterable[int]],
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+        now: Optional[float] = None
+    ) -> None:
+        """Кладет уведомление в буфер каждого чата; None — всем пользователям"""
+        now = time.time() if now is None else now
+        if chat_ids is None:
+            chat_ids = get_recipients()
+        item = {
+            "text": text,
+            "reply_markup": reply_markup.model_dump(exclude_none=True) if reply_markup else None
+        }
+        for chat_id in chat_ids:
+            self._pending.setdefault(chat_id, []).append(item)
+            self.enqueued += 1
+            # Окно отсчитывается от первого уведомления в буфере
+            if chat_id not in self._due:
+                self._due[chat_id] = self._deliver_at(chat_id, now + self.window)
+        self._save()
+
+    def collect_due(self, now: Optional[float] = None) -> Tuple[List[OutboundMessage], List[Tuple[int, float]]]:
+        """
+        Забирает из буфера чаты, у которых истекло окно и нет тихих часов
+        :return: сообщения и плановые слоты (чат, время отправки) вошедших в них уведомлений
+        """
+        now = time.time() if now is None else now
+        messages: List[OutboundMessage] = []
+        slots: List[Tuple[int, float]] = []
+        for chat_id, due in list(self._due.items()):
+            if due > now:
+                continue
+            deliver_at = self._deliver_at(chat_id, now)
+            if deliver_at > now:
+                # Тихие часы начались или изменились после постановки в буфер
+                self._due[chat_id] = deliver_at
+                continue
+            del self._due[chat_id]
+            slots.append((chat_id, due))
+            messages.extend(merge_notifications(chat_id, self._pending.pop(chat_id, [])))
+        if messages:
+            self._save()
+        return messages, slots
+
+    async def flush(self, bot: Bot) -> None:
+        """Отправляет накопленные сводки; вызывается планировщиком"""
+        messages, slots = self.collect_due()
+        if not messages:
+            return
+        self.sent += len(messages)
+        logger.info(f"Sending {len(messages)} digest messages ({self.enqueued} notifications buffered so far)")
+        # id зависит только от сохраненных слотов: та же пачка, отправленная повторно
+        # из восстановленного буфера, будет пропущена по отметке .done
+        broadcast_id = make_broadcast_id("digest", min(due for _, due in slots), slots)
+        await broadcaster.send_messages(bot, broadcast_id, messages, lane="notification")
+
+    def _deliver_at(self, chat_id: int, at: float) -> float:
+        timezone, quiet_hours = self._prefs.get(chat_id, (None, None))
+        return quiet_until(quiet_hours, timezone, at) or at
+
+    def _save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps({"pending": self._pending, "due": self._due}, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Failed to save digest buffer: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает число ожидающих чатов и отношение уведомлений к сообщениям"""
+        return {
+            "pending_chats": len(self._pending),
+            "enqueued": self.enqueued,
+            "sent": self.sent
+        }
+
+digest = DigestBuffer(settings.DIGEST_PATH, settings.DIGEST_WINDOW)
@@ -0,0 +1,108 @@
+"""
+Потоковая выгрузка данных в CSV, JSONL и HTML
+"""
+import csv
+import gzip
+import html
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from services.storage import schedule_storage, get_data_snapshot
+
+EXPORT_FORMATS = ("csv", "jsonl", "html")
+
+# Порядок разделов в выгрузке
+EXPORT_SECTIONS = ("tasks", "goals", "schedule", "moods")
+
+CSV_COLUMNS = [
+    "section", "text", "priority", "deadline", "completed", "created_at",
+    "completed_at", "time", "value", "comment", "timestamp"
+]
+
+# Колонки HTML-таблиц по разделам
+SECTION_COLUMNS = {
+    "tasks": ["text", "priority", "deadline", "completed", "created_at", "completed_at"],
+    "goals": ["text", "priority", "deadline", "completed", "progress", "created_at", "completed_at"],
+    "schedule": ["time", "text", "created_at"],
+    "moods": ["timestamp", "value", "comment"]
+}
+
+SECTION_TITLES = {
+    "tasks": "Задачи",
+    "goals": "Цели",
+    "schedule": "Расписание",
+    "moods": "Настроение"
+}
+
+def format_cell(value: Any) -> str:
+    """Преобразует значение поля в текст ячейки"""
+    return "" if value is None else str(value)
+
+def load_export_data() -> Dict[str, List[Dict[str, Any]]]:
+    """Читает разделы выгрузки; вызывается в цикле событий, до передачи в поток"""
+    data = get_data_snapshot()
+    data["schedule"] = schedule_storage.get_schedule()
+    return data
+
+def iter_records(data: Dict[str, List[Dict[str, Any]]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Перебирает записи всех разделов в порядке выгрузки"""
+    for section in EXPORT_SECTIONS:
+        for record in data.get(section, []):
+            yield section, record
+
+def iter_csv(records: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[str]:
+    """Кодирует записи в CSV построчно"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    for section, record in records:
+        writer.writerow({"section": section, **record})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def iter_jsonl(records: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[str]:
+    """Кодирует записи в JSON Lines"""
+    for section, record in records:
+        yield json.dumps({"section": section, **record}, ensure_ascii=False) + "\n"
+
+def iter_html(records: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[str]:
+    """Кодирует записи в HTML, по таблице на раздел"""
+    yield (
+        "<!DOCTYPE html>\n<html lang=\"ru\"><head><meta charset=\"utf-8\">"
+        "<title>Экспорт</title></head><body>\n"
+    )
+    current = None
+    for section, record in records:
+        if section != current:
+            if current is not None:
+                yield "</table>\n"
+            current = section
+            header = "".join(f"<th>{column}</th>" for column in SECTION_COLUMNS[section])
+            yield (
+                f"<h2>{html.escape(SECTION_TITLES[section])}</h2>\n"
+                f"<table border=\"1\">\n<tr>{header}</tr>\n"
+            )
+        cells = "".join(
+            f"<td>{html.escape(format_cell(record.get(column)))}</td>"
+            for column in SECTION_COLUMNS[section]
+        )
+        yield f"<tr>{cells}</tr>\n"
+    if current is not None:
+        yield "</table>\n"
+    yield "</body></html>\n"
+
+ENCODERS = {
+    "csv": iter_csv,
+    "jsonl": iter_jsonl,
+    "html": iter_html
+}
+
+def write_export(fmt: str, path: str, data: Dict[str, List[Dict[str, Any]]]) -> None:
+    """Записывает выгрузку в gzip-файл, не собирая закодированный текст в памяти"""
+    if fmt not in ENCODERS:
+        raise ValueError(f"Неизвестный формат. Доступны: {', '.join(EXPORT_FORMATS)}")
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+        for chunk in ENCODERS[fmt](iter_records(data)):
+            f.write(chunk)
@@ -1,6 +1,8 @@
 import asyncio
 import logging
+import time
 from datetime import datetime
+from typing import Optional
 from aiogram import Bot
 from config import settings
 
@@ -11,6 +13,11 @@ class KeepAliveService:
         self.bot = bot
         self._running = False
         self._task = None
+        # Результат последних пингов; проверка здоровья читает его вместо своего getMe
+        self.last_ok: Optional[float] = None
+        self.username: Optional[str] = None
+        self.failures = 0
+        self.last_error: Optional[str] = None
 
     async def start(self):
         """Start the keep-alive service"""
@@ -40,14 +47,19 @@ class KeepAliveService:
         while self._running:
             try:
                 # Проверяем соединение с Telegram
-                await self.bot.get_me()
+                bot_info = await self.bot.get_me()
+                self.last_ok = time.time()
+                self.username = bot_info.username
+                self.failures = 0
+                self.last_error = None
                 
                 # Логируем время последней активности
-                logger.info("keep_alive_ping", timestamp=datetime.now().isoformat())
+                logger.info(f"keep_alive_ping at {datetime.now().isoformat()}")
                 
-                # Ждем 5 минут перед следующей проверкой
-                await asyncio.sleep(300)
+                await asyncio.sleep(settings.KEEP_ALIVE_INTERVAL)
             except Exception as e:
-                logger.error("keep_alive_error", error=str(e))
+                self.failures += 1
+                self.last_error = str(e) or type(e).__name__
+                logger.error(f"keep_alive_error: {e}")
                 # При ошибке ждем меньше времени перед повторной попыткой
                 await asyncio.sleep(60) 
\ No newline at end of file
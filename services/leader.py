@@ -0,0 +1,88 @@
+"""
+Выбор ведущей реплики через аренду ключа в Redis
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# Продлевает аренду, только если ключ все еще принадлежит этой реплике
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+LeaderCallback = Callable[[], Awaitable[None]]
+
+class LeaderLease:
+    """
+    Аренда лидерства: SET NX PX захватывает ключ, скрипт продлевает его.
+    Реплика считает себя ведущей, только пока не истек срок последнего
+    подтвержденного продления
+    """
+
+    def __init__(self, redis: Redis, key: str, ttl: float):
+        self.redis = redis
+        self.key = key
+        self.ttl = ttl
+        self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+        self._expires_at = 0.0
+
+    @property
+    def is_leader(self) -> bool:
+        return time.monotonic() < self._expires_at
+
+    async def acquire(self) -> bool:
+        """Захватывает или продлевает аренду; возвращает True, если реплика ведущая"""
+        started = time.monotonic()
+        ttl_ms = int(self.ttl * 1000)
+        if self.is_leader:
+            held = await self.redis.eval(RENEW_SCRIPT, 1, self.key, self.token, ttl_ms)
+        else:
+            held = await self.redis.set(self.key, self.token, nx=True, px=ttl_ms)
+        # Срок отсчитывается от отправки запроса, чтобы не переоценить аренду
+        self._expires_at = started + self.ttl if held else 0.0
+        return bool(held)
+
+    async def release(self) -> None:
+        """Освобождает аренду, чтобы другая реплика не ждала истечения срока"""
+        if not self.is_leader:
+            return
+        self._expires_at = 0.0
+        try:
+            await self.redis.eval(RELEASE_SCRIPT, 1, self.key, self.token)
+        except RedisError as e:
+            logger.warning(f"Failed to release leader lease: {e}")
+
+    async def run(self, on_elected: LeaderCallback, on_demoted: LeaderCallback) -> None:
+        """Поддерживает аренду и сообщает о смене роли"""
+        leading = False
+        while True:
+            try:
+                await self.acquire()
+            except RedisError as e:
+                logger.warning(f"Leader lease check failed: {e}")
+            if self.is_leader != leading:
+                leading = self.is_leader
+                logger.info(f"Replica {self.token} {'elected leader' if leading else 'lost leadership'}")
+                try:
+                    await (on_elected() if leading else on_demoted())
+                except Exception as e:
+                    logger.error(f"Leader transition handler failed: {e}")
+            await asyncio.sleep(self.ttl / 3)
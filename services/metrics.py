@@ -0,0 +1,242 @@
+"""
+Метрики процесса в текстовом формате Prometheus: счетчики, значения и
+гистограммы с метками. Процессы-обработчики обновлений публикуют свои
+метрики в Redis, и /metrics основного процесса отдает их вместе со своими
+"""
+import asyncio
+import inspect
+import json
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Sequence, Tuple, Union
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Снимок метрик другого процесса и метки, которые добавляются к его значениям
+Source = Tuple[Dict[str, str], Dict[str, Any]]
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labels": list(self.labelnames),
+            "values": [[list(key), value] for key, value in self._values.items()]
+        }
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = float(value)
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # Число наблюдений в каждой корзине (последняя — выше всех границ), сумма и количество
+            state = self._values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+        state["counts"][bisect_left(self.buckets, value)] += 1
+        state["sum"] += value
+        state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**super().snapshot(), "buckets": list(self.buckets)}
+
+Collector = Callable[[], Union[None, Awaitable[None]]]
+
+class MetricsRegistry:
+    """Метрики процесса, сборщики текущих значений и источники других процессов"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Collector] = []
+        self._sources: List[Callable[[], Awaitable[List[Source]]]] = []
+
+    def _register(self, metric: Metric) -> Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Collector) -> None:
+        """Функция, которая обновляет значения (глубины очередей и т.п.) перед выгрузкой"""
+        self._collectors.append(collector)
+
+    def add_source(self, source: Callable[[], Awaitable[List[Source]]]) -> None:
+        """Функция, которая возвращает снимки метрик других процессов"""
+        self._sources.append(source)
+
+    async def collect(self) -> None:
+        for collector in self._collectors:
+            try:
+                result = collector()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    async def export(self) -> str:
+        """Собирает свои метрики и метрики источников в текст для Prometheus"""
+        await self.collect()
+        sources: List[Source] = [({}, self.snapshot())]
+        for source in self._sources:
+            try:
+                sources.extend(await source())
+            except Exception as e:
+                logger.error(f"Metrics source failed: {e}")
+        return render(sources)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(pairs: List[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def render(sources: List[Source]) -> str:
+    """Текстовый формат Prometheus; одноименные метрики всех источников идут одним блоком"""
+    metrics: Dict[str, Dict[str, Any]] = {}
+    for extra, snapshot in sources:
+        for name, metric in snapshot.items():
+            entry = metrics.setdefault(name, {**metric, "rows": []})
+            entry["rows"].extend((extra, metric["labels"], key, value) for key, value in metric["values"])
+    lines = []
+    for name, metric in metrics.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for extra, labelnames, key, value in metric["rows"]:
+            pairs = list(zip(labelnames, key)) + sorted(extra.items())
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric["buckets"]) + [float("inf")], value["counts"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(pairs + [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(pairs)} {_number(value['sum'])}")
+            lines.append(f"{name}_count{_labels(pairs)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+HANDLER_SECONDS = metrics.histogram(
+    "bot_handler_duration_seconds", "Time spent in update handlers",
+    ("event", "module", "handler", "status")
+)
+TELEGRAM_SECONDS = metrics.histogram(
+    "bot_telegram_request_duration_seconds", "Bot API request latency, without outbound queue wait",
+    ("method", "status")
+)
+STORAGE_SECONDS = metrics.histogram(
+    "bot_storage_duration_seconds", "JSON storage load and save time",
+    ("file", "operation")
+)
+STORAGE_BYTES = metrics.counter(
+    "bot_storage_bytes_total", "Bytes read and written by JSON storage",
+    ("file", "operation")
+)
+STORAGE_LOCK_WAIT = metrics.histogram(
+    "bot_storage_lock_wait_seconds", "Time spent waiting for the cross-process storage lock",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+REDIS_SECONDS = metrics.histogram(
+    "bot_redis_command_duration_seconds", "Redis command and pipeline latency, including pool wait",
+    ("command",), buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+)
+REDIS_ERRORS = metrics.counter(
+    "bot_redis_command_errors_total", "Failed Redis commands", ("command",)
+)
+REDIS_POOL_CONNECTIONS = metrics.gauge(
+    "bot_redis_pool_connections", "Redis pool connections by state", ("state",)
+)
+RATE_LIMITED = metrics.counter(
+    "bot_rate_limit_rejections_total", "Events rejected by the rate limiter", ("event",)
+)
+QUEUE_DEPTH = metrics.gauge(
+    "bot_queue_depth", "Items waiting in internal queues", ("queue",)
+)
+
+def setup_metrics_endpoint(app: web.Application) -> None:
+    """Регистрирует GET /metrics"""
+    async def handle(request: web.Request) -> web.Response:
+        body = await metrics.export()
+        return web.Response(body=body.encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    app.router.add_route("GET", "/metrics", handle)
+
+async def publish_metrics(redis, key: str, interval: float, stop: asyncio.Event) -> None:
+    """Периодически кладет снимок метрик процесса в Redis для основного процесса"""
+    while not stop.is_set():
+        try:
+            await metrics.collect()
+            await redis.set(key, json.dumps(metrics.snapshot()), ex=int(interval * 4))
+        except Exception as e:
+            logger.error(f"Failed to publish metrics: {e}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+def redis_source(redis, keys: Dict[str, str], label: str) -> Callable[[], Awaitable[List[Source]]]:
+    """Источник снимков, опубликованных publish_metrics; метка label получает имя ключа"""
+    async def load() -> List[Source]:
+        names = list(keys)
+        raw = await redis.mget([keys[name] for name in names])
+        return [({label: name}, json.loads(data)) for name, data in zip(names, raw) if data]
+    return load
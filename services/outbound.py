@@ -0,0 +1,125 @@
+"""
+Приоритетная очередь исходящих запросов к Bot API
+"""
+import asyncio
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterator, Optional
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType, Response
+from config import settings
+from services.throttling import TokenBucket
+from services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Полосы в порядке убывания приоритета
+LANES = ("interactive", "notification", "bulk")
+
+# Ответы пользователям идут по интерактивной полосе, если код явно не указал другую
+outbound_lane: ContextVar[str] = ContextVar("outbound_lane", default="interactive")
+
+# Запросы, на которые распространяются лимиты Telegram на отправку сообщений
+THROTTLED_PREFIXES = ("Send", "Edit", "Copy", "Forward")
+
+@contextmanager
+def use_lane(lane: str) -> Iterator[None]:
+    """Отправляет запросы внутри блока по указанной полосе"""
+    if lane not in LANES:
+        raise ValueError(f"Unknown outbound lane: {lane}")
+    token = outbound_lane.set(lane)
+    try:
+        yield
+    finally:
+        outbound_lane.reset(token)
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """
+    Middleware сессии бота: запросы на отправку ждут разрешения в очереди
+    своей полосы. Разрешения выдаются по общему лимиту скорости, строго по
+    приоритету полос, и каждая полоса ограничена собственным бюджетом
+    """
+
+    def __init__(self, rate: float, lane_rates: Dict[str, float]):
+        self.rate = rate
+        self.lane_rates = lane_rates
+        self.set_share(1.0)
+        self._queues: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+        self._sent: Dict[str, int] = {lane: 0 for lane in LANES}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def set_share(self, share: float) -> None:
+        """Оставляет процессу долю лимитов, когда запросы отправляют несколько процессов"""
+        self.bucket = TokenBucket(self.rate * share, capacity=1)
+        self.lane_buckets = {lane: TokenBucket(self.lane_rates[lane] * share, capacity=1) for lane in LANES}
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        if type(method).__name__.startswith(THROTTLED_PREFIXES):
+            lane = outbound_lane.get()
+            with span("outbound.wait", lane=lane):
+                await self.acquire(lane)
+        return await make_request(bot, method)
+
+    async def acquire(self, lane: str) -> None:
+        """Ждет своей очереди на отправку в полосе lane"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._grant_loop())
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[lane].append(waiter)
+        self._wakeup.set()
+        await waiter
+
+    async def _grant_loop(self) -> None:
+        """Выдает разрешения ожидающим по приоритету полос"""
+        while True:
+            granted = False
+            waits = []
+            for lane in LANES:
+                queue = self._queues[lane]
+                # Отмененные ожидания (например, по таймауту обработчика) пропускаем
+                while queue and queue[0].done():
+                    queue.popleft()
+                if not queue:
+                    continue
+                if self.lane_buckets[lane].try_acquire():
+                    await self.bucket.acquire()
+                    waiter = queue.popleft()
+                    if not waiter.done():
+                        waiter.set_result(None)
+                        self._sent[lane] += 1
+                    granted = True
+                    break
+                waits.append(self.lane_buckets[lane].delay())
+            if granted:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=min(waits) if waits else None)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Возвращает глубину очереди и число отправок по полосам"""
+        return {
+            lane: {"queued": len(self._queues[lane]), "sent": self._sent[lane]}
+            for lane in LANES
+        }
+
+outbound_scheduler = OutboundScheduler(
+    settings.OUTBOUND_RATE,
+    {
+        "interactive": settings.OUTBOUND_INTERACTIVE_RATE,
+        "notification": settings.OUTBOUND_NOTIFICATION_RATE,
+        "bulk": settings.OUTBOUND_BULK_RATE
+    }
+)
@@ -0,0 +1,105 @@
+"""
+Разбор быстрого добавления задач: много строк в одном сообщении
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+# Маркеры приоритета: !high, !высокий и т.д.
+PRIORITY_MARKERS = {
+    "high": "высокий", "h": "высокий", "высокий": "высокий", "в": "высокий",
+    "medium": "средний", "m": "средний", "средний": "средний", "с": "средний",
+    "low": "низкий", "l": "низкий", "низкий": "низкий", "н": "низкий"
+}
+
+# Относительные дедлайны: @завтра, @week и т.д. (смещение в днях)
+RELATIVE_DEADLINES = {
+    "today": 0, "сегодня": 0,
+    "tomorrow": 1, "завтра": 1,
+    "послезавтра": 2,
+    "week": 7, "неделя": 7
+}
+
+PRIORITY_RE = re.compile(r"(?<!\S)!(\w+)")
+DEADLINE_RE = re.compile(r"(?<!\S)@(\S+)")
+DAY_MONTH_RE = re.compile(r"(\d{1,2})\.(\d{1,2})")
+BULLET_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+
+@dataclass
+class QuickAddResult:
+    """Результат разбора сообщения"""
+    tasks: List[dict] = field(default_factory=list)
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+
+def parse_deadline(marker: str, today: date) -> Optional[str]:
+    """Преобразует маркер дедлайна в YYYY-MM-DD, None если формат неизвестен"""
+    marker = marker.lower()
+    if marker in RELATIVE_DEADLINES:
+        return (today + timedelta(days=RELATIVE_DEADLINES[marker])).strftime("%Y-%m-%d")
+
+    for fmt in ("%Y-%m-%d", "%d.%m.%Y"):
+        try:
+            return datetime.strptime(marker, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+
+    match = DAY_MONTH_RE.fullmatch(marker)
+    if match is None:
+        return None
+    day, month = int(match.group(1)), int(match.group(2))
+    # Дата без года — ближайшая, не раньше сегодняшней; 29.02 ищется до високосного года
+    for year in range(today.year, today.year + 5):
+        try:
+            parsed = date(year, month, day)
+        except ValueError:
+            continue
+        if parsed >= today:
+            return parsed.strftime("%Y-%m-%d")
+    return None
+
+def parse_line(line: str, today: date) -> dict:
+    """Разбирает одну строку с маркерами приоритета и дедлайна"""
+    priority = "средний"
+    deadline = None
+
+    for marker in PRIORITY_RE.findall(line):
+        if marker.lower() not in PRIORITY_MARKERS:
+            raise ValueError(f"неизвестный приоритет !{marker}")
+        priority = PRIORITY_MARKERS[marker.lower()]
+
+    def take_deadline(match: re.Match) -> str:
+        nonlocal deadline
+        parsed = parse_deadline(match.group(1), today)
+        if parsed is None:
+            # Не дата, например @username: остается в тексте задачи
+            return match.group(0)
+        deadline = parsed
+        return ""
+
+    text = DEADLINE_RE.sub(take_deadline, PRIORITY_RE.sub("", BULLET_RE.sub("", line)))
+    text = " ".join(text.split())
+    if not text:
+        raise ValueError("пустой текст задачи")
+
+    return {"text": text, "priority": priority, "deadline": deadline}
+
+def parse_quick_add(message_text: str, today: Optional[date] = None) -> QuickAddResult:
+    """
+    Разбирает многострочное сообщение в список задач
+    :param message_text: текст сообщения, одна задача на строку
+    :param today: дата для относительных дедлайнов
+    :return: задачи и ошибки разбора с номерами строк
+    """
+    today = today or datetime.now().date()
+    result = QuickAddResult()
+
+    for number, line in enumerate(message_text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            result.tasks.append(parse_line(line, today))
+        except ValueError as e:
+            result.errors.append((number, str(e)))
+
+    return result
@@ -1,5 +1,6 @@
 from aiogram import Bot
-from config import settings
+from services.digest import digest
+from typing import List, Optional
 import random
 
 QUOTES = [
@@ -9,6 +10,7 @@ QUOTES = [
     "💡 Всё, что нужно — уже внутри тебя."
 ]
 
-async def send_quote(bot: Bot):
+async def send_quote(bot: Bot, chat_ids: Optional[List[int]] = None):
+    """Рассылает утреннюю цитату всем пользователям или списку чатов"""
     quote = random.choice(QUOTES)
-    await bot.send_message(settings.USER_ID, f"Доброе утро! ☀️\n\n{quote}")
+    digest.enqueue(chat_ids, f"Доброе утро! ☀️\n\n{quote}")
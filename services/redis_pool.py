@@ -0,0 +1,165 @@
+"""
+Общий пул соединений Redis для FSM, ограничения частоты, очередей и
+проверки здоровья, со статистикой занятости пула и задержек команд
+"""
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from redis.asyncio import BlockingConnectionPool, Redis
+from config import settings
+from services.metrics import REDIS_SECONDS, REDIS_ERRORS, REDIS_POOL_CONNECTIONS
+from services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Блокирующие команды ждут данных, а не Redis, и не входят в перцентили
+BLOCKING_COMMANDS = {"BLPOP", "BRPOP", "BRPOPLPUSH", "BLMOVE", "BZPOPMIN", "BZPOPMAX", "XREAD", "XREADGROUP"}
+
+class CommandStats:
+    """Число вызовов, ошибки и задержки команд Redis"""
+
+    def __init__(self, window: int = 2048):
+        self.commands: Dict[str, Dict[str, float]] = {}
+        # Последние задержки неблокирующих команд для перцентилей
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def record(self, command: str, duration: float, failed: bool = False) -> None:
+        stats = self.commands.get(command)
+        if stats is None:
+            stats = self.commands[command] = {"count": 0, "errors": 0, "total": 0.0, "max": 0.0}
+        stats["count"] += 1
+        stats["total"] += duration
+        if duration > stats["max"]:
+            stats["max"] = duration
+        if failed:
+            stats["errors"] += 1
+            REDIS_ERRORS.inc(command=command)
+        REDIS_SECONDS.observe(duration, command=command)
+        if command not in BLOCKING_COMMANDS:
+            self.recent.append(duration)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "p50_ms": _ms(self.percentile(0.5)),
+            "p99_ms": _ms(self.percentile(0.99)),
+            "commands": {
+                name: {
+                    "count": int(stats["count"]),
+                    "errors": int(stats["errors"]),
+                    "avg_ms": _ms(stats["total"] / stats["count"]),
+                    "max_ms": _ms(stats["max"])
+                }
+                for name, stats in sorted(self.commands.items())
+            }
+        }
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 3)
+
+class InstrumentedRedis(Redis):
+    """Клиент Redis, который замеряет каждую команду и каждый конвейер"""
+
+    def __init__(self, *args, command_stats: CommandStats, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.command_stats = command_stats
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        failed = False
+        try:
+            with span("redis", command=str(args[0]).upper()):
+                return await super().execute_command(*args, **options)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.command_stats.record(str(args[0]).upper(), time.perf_counter() - started, failed)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None):
+        """Конвейер: все команды уходят за один проход, время пишется как PIPELINE"""
+        pipe = super().pipeline(transaction=transaction, shard_hint=shard_hint)
+        execute = pipe.execute
+        command_stats = self.command_stats
+
+        async def timed_execute(raise_on_error: bool = True):
+            started = time.perf_counter()
+            failed = False
+            try:
+                with span("redis", command="PIPELINE", size=len(pipe.command_stack)):
+                    return await execute(raise_on_error)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                command_stats.record("PIPELINE", time.perf_counter() - started, failed)
+
+        pipe.execute = timed_execute
+        return pipe
+
+class RedisPool:
+    """Один настроенный пул соединений и клиент поверх него на процесс"""
+
+    def __init__(self):
+        self.pool: Optional[BlockingConnectionPool] = None
+        self.client: Optional[InstrumentedRedis] = None
+        self.command_stats = CommandStats()
+
+    async def connect(self, url: str) -> InstrumentedRedis:
+        """Создает пул и проверяет соединение; при ошибке пул закрывается"""
+        pool = BlockingConnectionPool.from_url(
+            url,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            decode_responses=True,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_keepalive=True,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            retry_on_timeout=True
+        )
+        client = InstrumentedRedis(connection_pool=pool, command_stats=self.command_stats)
+        try:
+            await client.ping()
+        except Exception:
+            await pool.disconnect()
+            raise
+        self.pool = pool
+        self.client = client
+        logger.info(f"Redis pool ready (max {settings.REDIS_MAX_CONNECTIONS} connections)")
+        return client
+
+    def utilization(self) -> Dict[str, Any]:
+        """Занятые, свободные и максимальные соединения пула"""
+        if self.pool is None:
+            return {"in_use": 0, "idle": 0, "max": settings.REDIS_MAX_CONNECTIONS}
+        return {
+            "in_use": len(getattr(self.pool, "_in_use_connections", ())),
+            "idle": len(getattr(self.pool, "_available_connections", ())),
+            "max": self.pool.max_connections
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pool": self.utilization(), **self.command_stats.snapshot()}
+
+    def collect_metrics(self) -> None:
+        pool = self.utilization()
+        REDIS_POOL_CONNECTIONS.set(pool["in_use"], state="in_use")
+        REDIS_POOL_CONNECTIONS.set(pool["idle"], state="idle")
+        REDIS_POOL_CONNECTIONS.set(pool["max"], state="max")
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        if self.pool is not None:
+            await self.pool.disconnect()
+            self.pool = None
+
+redis_pool = RedisPool()
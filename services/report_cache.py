@@ -0,0 +1,95 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Optional
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class ReportCache:
+    """Дисковый кэш отчетов, адресуемый хэшем снимка данных"""
+
+    def __init__(self, cache_dir: str, max_entries: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+
+    @staticmethod
+    def make_key(data: Dict[str, Any], report_date: date) -> str:
+        """Вычисляет ключ по снимку данных и дате отчета"""
+        payload = json.dumps(
+            {"date": report_date.isoformat(), "data": data},
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _pdf_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pdf"
+
+    def _file_id_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.file_id"
+
+    def get_pdf(self, key: str) -> Optional[bytes]:
+        """Возвращает закэшированный PDF или None"""
+        path = self._pdf_path(key)
+        try:
+            pdf = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Failed to read cached report {key}: {e}")
+            return None
+        # Обновляем mtime, чтобы вытеснялись самые давно использованные записи
+        os.utime(path)
+        return pdf
+
+    def has_pdf(self, key: str) -> bool:
+        """Проверяет, есть ли PDF в кэше"""
+        return self._pdf_path(key).exists()
+
+    def put_pdf(self, key: str, pdf: bytes) -> None:
+        """Сохраняет PDF в кэш и вытесняет старые записи"""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._pdf_path(key).with_suffix(".tmp")
+            tmp_path.write_bytes(pdf)
+            os.replace(tmp_path, self._pdf_path(key))
+            self._evict()
+        except OSError as e:
+            logger.warning(f"Failed to cache report {key}: {e}")
+
+    def get_file_id(self, key: str) -> Optional[str]:
+        """Возвращает Telegram file_id ранее отправленного отчета"""
+        try:
+            return self._file_id_path(key).read_text(encoding="utf-8").strip() or None
+        except OSError:
+            return None
+
+    def set_file_id(self, key: str, file_id: str) -> None:
+        """Запоминает Telegram file_id отправленного отчета"""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._file_id_path(key).write_text(file_id, encoding="utf-8")
+        except OSError as e:
+            logger.warning(f"Failed to store file_id for report {key}: {e}")
+
+    def forget_file_id(self, key: str) -> None:
+        """Удаляет file_id, который Telegram больше не принимает"""
+        self._file_id_path(key).unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        """Оставляет не более max_entries последних отчетов"""
+        entries = sorted(
+            self.cache_dir.glob("*.pdf"),
+            key=lambda path: path.stat().st_mtime,
+            reverse=True
+        )
+        for path in entries[self.max_entries:]:
+            path.unlink(missing_ok=True)
+            self._file_id_path(path.stem).unlink(missing_ok=True)
+
+report_cache = ReportCache(settings.REPORT_CACHE_DIR, settings.REPORT_CACHE_MAX_ENTRIES)
@@ -10,9 +10,23 @@ from pathlib import Path
 import urllib.request
 import logging
 import ssl
+import pickle
+from weakref import WeakKeyDictionary
+from services.storage import get_data_snapshot
+from services.report_layout import LayoutLine, get_layout, paginate, render_pages
+from io import BytesIO
 
 logger = logging.getLogger(__name__)
 
+BASE_DIR = Path(__file__).resolve().parent.parent
+FONT_PATH = BASE_DIR / 'fonts' / 'DejaVuSans.ttf'  # Шрифт поставляется вместе с репозиторием
+FONT_CACHE_DIR = BASE_DIR / 'fonts' / '.cache'
+FONT_NAME = 'CustomFont'  # Используем одно имя шрифта для всех случаев
+FALLBACK_FONT_NAME = 'HeiseiKakuGo-W5'
+PAGE_MARGIN = 50
+
+_registered_font_name = None
+
 # Ensure required directories exist
 def ensure_directories():
     """Create necessary directories if they don't exist."""
@@ -20,11 +34,12 @@ def ensure_directories():
     for directory in directories:
         Path(directory).mkdir(exist_ok=True)
 
-def download_font():
+def download_font(font_path=FONT_PATH):
     """Download DejaVu Sans font if it doesn't exist."""
-    font_path = Path('fonts/DejaVuSans.ttf')
+    font_path = Path(font_path)
     if not font_path.exists():
         logger.info("Downloading DejaVu Sans font...")
+        font_path.parent.mkdir(parents=True, exist_ok=True)
         # Список URL-ов для скачивания шрифта
         font_urls = [
             "https://raw.githubusercontent.com/dejavu-fonts/dejavu-fonts/master/ttf/DejaVuSans.ttf",
@@ -57,34 +72,76 @@ def download_font():
             return False
     return True
 
-# Create directories and try to download font
-ensure_directories()
-use_dejavu = download_font()
+class CachedTTFont(TTFont):
+    """TTFont that can be pickled, so parsed metrics can be cached on disk."""
 
-# Register font
-FONT_NAME = 'CustomFont'  # Используем одно имя шрифта для всех случаев
-if use_dejavu:
-    font_path = Path('fonts/DejaVuSans.ttf')
-    if font_path.exists():
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Per-document subset state is a WeakKeyDictionary and is not picklable
+        state.pop('state', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.state = WeakKeyDictionary()
+
+def load_cached_font(font_path):
+    """Load a parsed TTF from the on-disk metrics cache, parsing it on a miss."""
+    font_path = Path(font_path)
+    stat = font_path.stat()
+    cache_path = FONT_CACHE_DIR / f"{font_path.stem}-{stat.st_size}-{int(stat.st_mtime)}.pickle"
+    
+    try:
+        with open(cache_path, 'rb') as f:
+            font = pickle.load(f)
+        if font.fontName == FONT_NAME:
+            return font
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Ignoring broken font cache {cache_path}: {e}")
+    
+    font = CachedTTFont(FONT_NAME, str(font_path))
+    try:
+        FONT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(font, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Could not write font cache {cache_path}: {e}")
+    return font
+
+def register_fallback_font():
+    """Register the built-in CID font and return its name."""
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+    pdfmetrics.registerFont(UnicodeCIDFont(FALLBACK_FONT_NAME))
+    return FALLBACK_FONT_NAME
+
+def init_report_assets():
+    """Register the report font on first use and return its name.
+
+    The bundled ``fonts/DejaVuSans.ttf`` is used offline; the font is only
+    downloaded when that file is missing.
+    """
+    global _registered_font_name
+    if _registered_font_name is not None:
+        return _registered_font_name
+    
+    ensure_directories()
+    if FONT_PATH.exists() or download_font():
         try:
-            pdfmetrics.registerFont(TTFont(FONT_NAME, str(font_path)))
+            pdfmetrics.registerFont(load_cached_font(FONT_PATH))
+            _registered_font_name = FONT_NAME
             logger.info("DejaVu Sans font registered successfully")
         except Exception as e:
             logger.error(f"Error registering DejaVu Sans font: {e}")
             # В случае ошибки регистрации TTF используем встроенные шрифты
-            from reportlab.pdfbase.cidfonts import UnicodeCIDFont
-            pdfmetrics.registerFont(UnicodeCIDFont('HeiseiKakuGo-W5'))
-            FONT_NAME = 'HeiseiKakuGo-W5'
+            _registered_font_name = register_fallback_font()
     else:
-        logger.warning("DejaVu Sans font file not found. Using built-in font.")
-        from reportlab.pdfbase.cidfonts import UnicodeCIDFont
-        pdfmetrics.registerFont(UnicodeCIDFont('HeiseiKakuGo-W5'))
-        FONT_NAME = 'HeiseiKakuGo-W5'
-else:
-    logger.warning("Using built-in font.")
-    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
-    pdfmetrics.registerFont(UnicodeCIDFont('HeiseiKakuGo-W5'))
-    FONT_NAME = 'HeiseiKakuGo-W5'
+        logger.warning("Using built-in font.")
+        _registered_font_name = register_fallback_font()
+    return _registered_font_name
 
 def load_json(filename):
     """Load data from a JSON file."""
@@ -118,106 +175,68 @@ def format_task(task):
     status = "✓" if task.get("completed", False) else "□"
     return f"{status} {task['text']}"
 
-def draw_wrapped_text(c, text, x, y, width, font_name, font_size, line_height):
-    """Draw text that automatically wraps to the next line if too long."""
-    c.setFont(font_name, font_size)
-    words = text.split()
-    line = ''
-    
-    for word in words:
-        test_line = line + ' ' + word if line else word
-        if c.stringWidth(test_line, font_name, font_size) < width:
-            line = test_line
-        else:
-            if y < 50:  # Check if we're near the bottom of the page
-                c.showPage()
-                y = A4[1] - 50  # Reset to top of new page
-                c.setFont(font_name, font_size)
-            c.drawString(x, y, line)
-            y -= line_height
-            line = word
-    
-    if line:
-        if y < 50:  # Check if we're near the bottom of the page
-            c.showPage()
-            y = A4[1] - 50  # Reset to top of new page
-            c.setFont(font_name, font_size)
-        c.drawString(x, y, line)
-        y -= line_height
-    
-    return y
-
 def format_number(num, total):
     """Format numbers for better readability."""
     return f"{num}/{total}"
 
-def generate_full_report(output_path):
-    """Generate a comprehensive PDF report combining checklist, goals and productivity data."""
+def generate_full_report(output_path, data=None, now=None):
+    """Generate a comprehensive PDF report combining checklist, goals and productivity data.
+
+    ``output_path`` may be a filesystem path or a writable binary file-like object.
+    ``data`` is a snapshot with ``goals``, ``tasks`` and ``moods`` lists; it is
+    taken from storage when omitted. ``now`` fixes the report date.
+    """
     try:
-        # Ensure the output directory exists
-        output_dir = Path(output_path).parent
-        output_dir.mkdir(exist_ok=True)
+        font_name = init_report_assets()
+        data = data if data is not None else get_data_snapshot()
+        now = now or datetime.now()
+        goals = data.get("goals", [])
+        tasks = data.get("tasks", [])
+        moods = data.get("moods", [])
         
-        # Initialize PDF
-        c = canvas.Canvas(str(output_path), pagesize=A4)
-        width, height = A4
+        if isinstance(output_path, (str, os.PathLike)):
+            # Ensure the output directory exists
+            output_dir = Path(output_path).parent
+            output_dir.mkdir(exist_ok=True)
+            output_path = str(output_path)
         
-        # Set initial position
-        y = height - 50
+        width, height = A4
         line_height = 20
+        text_width = width - 2 * PAGE_MARGIN
+        body = get_layout(font_name, 12)
+        lines = []
+        
+        def add_line(text, **kwargs):
+            lines.append(LayoutLine(text, PAGE_MARGIN, 12, **kwargs))
+        
+        def add_wrapped(text):
+            for part in body.wrap(text, text_width):
+                add_line(part)
         
         # Title
-        c.setFont(FONT_NAME, 14)
-        now = datetime.now()
         date_str = now.strftime("%d.%m.%Y")
         title = f'Отчет по продуктивности ({date_str})'
-        c.drawString((width - c.stringWidth(title, FONT_NAME, 14)) / 2, y, title)
-        y -= line_height * 2
+        lines.append(LayoutLine(title, (width - get_layout(font_name, 14).line_width(title)) / 2, 14))
         
         # Goals section
-        c.setFont(FONT_NAME, 12)
-        c.drawString(50, y, 'Цели:')
-        y -= line_height
-        
-        goals = load_json('data/goals.json')
+        add_line('Цели:', gap_before=line_height)
         if goals:
             for goal in goals:
-                text = format_goal(goal)
-                y = draw_wrapped_text(c, text, 50, y, width - 100, FONT_NAME, 12, line_height)
+                add_wrapped(format_goal(goal))
         else:
-            c.drawString(50, y, 'Нет активных целей')
-            y -= line_height
-        y -= line_height
-        
-        # Tasks section
-        if y < 100:  # Check if we need a new page
-            c.showPage()
-            y = height - 50
-            c.setFont(FONT_NAME, 12)
+            add_line('Нет активных целей')
         
-        c.drawString(50, y, 'Задачи на сегодня:')
-        y -= line_height
-        
-        tasks = load_json('data/checklist.json')
+        # Tasks section, moved to a new page when there is little room left
+        add_line('Задачи на сегодня:', gap_before=line_height, min_y=100)
         if tasks:
             for task in tasks:
-                text = format_task(task)
-                y = draw_wrapped_text(c, text, 50, y, width - 100, FONT_NAME, 12, line_height)
+                add_wrapped(format_task(task))
         else:
-            c.drawString(50, y, 'Нет активных задач')
-            y -= line_height
-        y -= line_height
+            add_line('Нет активных задач')
         
         # Productivity section
-        if y < 150:  # Check if we need a new page
-            c.showPage()
-            y = height - 50
-            c.setFont(FONT_NAME, 12)
-        
-        c.drawString(50, y, 'Анализ продуктивности за неделю:')
-        y -= line_height
+        add_line('Анализ продуктивности за неделю:', gap_before=line_height, min_y=150)
         
-        moods = load_json('data/moods.json')
         week_ago = now - timedelta(days=7)
         week_moods = [m for m in moods if datetime.fromisoformat(m['timestamp']) > week_ago]
         
@@ -235,37 +254,38 @@ def generate_full_report(output_path):
                 
                 if mood_values:
                     avg_mood = sum(mood_values) / len(mood_values)
-                    c.drawString(50, y, f'Средняя оценка настроения: {avg_mood:.1f}/5')
-                    y -= line_height
+                    add_line(f'Средняя оценка настроения: {avg_mood:.1f}/5')
                 else:
-                    c.drawString(50, y, 'Нет валидных данных о настроении')
-                    y -= line_height
+                    add_line('Нет валидных данных о настроении')
                 
                 # Count completed tasks
-                tasks = load_json('data/checklist.json')
                 completed_tasks = sum(1 for t in tasks if t.get('completed', False))
-                total_tasks = len(tasks)
-                c.drawString(50, y, f'Выполнено задач: {format_number(completed_tasks, total_tasks)}')
-                y -= line_height
+                add_line(f'Выполнено задач: {format_number(completed_tasks, len(tasks))}')
                 
                 # Count completed goals
-                goals = load_json('data/goals.json')
                 completed_goals = sum(1 for g in goals if g.get('completed', False))
-                total_goals = len(goals)
-                c.drawString(50, y, f'Достигнуто целей: {format_number(completed_goals, total_goals)}')
-                y -= line_height
+                add_line(f'Достигнуто целей: {format_number(completed_goals, len(goals))}')
                 
             except Exception as e:
-                c.drawString(50, y, f'Ошибка при анализе данных: {str(e)}')
-                y -= line_height
+                add_line(f'Ошибка при анализе данных: {str(e)}')
         else:
-            c.drawString(50, y, 'Нет данных о продуктивности за последнюю неделю')
-            y -= line_height
+            add_line('Нет данных о продуктивности за последнюю неделю')
+        
+        # Lay out all pages up front, then draw
+        pages = paginate(lines, height - PAGE_MARGIN, PAGE_MARGIN, line_height)
+        c = canvas.Canvas(output_path, pagesize=A4)
+        render_pages(c, pages, font_name)
         
         # Save the report
         c.save()
-        logger.info(f"Report successfully generated at {output_path}")
+        logger.info("Report successfully generated")
         
     except Exception as e:
         logger.error(f"Failed to generate report: {str(e)}")
         raise
+
+def build_report_pdf(data=None, now=None):
+    """Render the full report in memory and return the PDF bytes."""
+    buffer = BytesIO()
+    generate_full_report(buffer, data, now)
+    return buffer.getvalue()
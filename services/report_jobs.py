@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+STAGE_TEXTS = {
+    "queued": "⏳ Отчет в очереди...",
+    "rendering": "🖨 Формирую отчет...",
+    "sending": "📤 Отправляю отчет...",
+    "done": "✅ Отчет отправлен",
+    "failed": "❌ Не удалось сформировать отчет"
+}
+
+StageCallback = Callable[[str], Awaitable[None]]
+
+class ReportJob:
+    """Задача формирования отчета с одним статусным сообщением"""
+
+    def __init__(self, message: Message):
+        self.message = message
+        self.status_message: Optional[Message] = None
+        self.stage: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def set_stage(self, stage: str, details: str = "") -> None:
+        """Отправляет или редактирует статусное сообщение"""
+        if stage == self.stage and not details:
+            return
+        self.stage = stage
+        text = STAGE_TEXTS[stage] + (f"\n{details}" if details else "")
+        try:
+            if self.status_message is None:
+                self.status_message = await self.message.answer(text)
+            else:
+                await self.status_message.edit_text(text)
+        except TelegramBadRequest as e:
+            logger.warning(f"Failed to update report status: {e}")
+
+class ReportJobManager:
+    """Очередь отчетов: один активный запрос на пользователя и общий лимит параллельности"""
+
+    def __init__(self, max_concurrency: int):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._jobs: Dict[int, ReportJob] = {}
+        self._running = 0
+
+    async def submit(self, user_id: int, message: Message, run: Callable[[StageCallback], Awaitable[None]]) -> bool:
+        """
+        Ставит отчет в очередь или присоединяется к уже идущему
+        :param user_id: пользователь, для которого формируется отчет
+        :param message: сообщение, в чат которого пишется статус
+        :param run: корутина, формирующая и отправляющая отчет
+        :return: True, если отчет отправлен
+        """
+        job = self._jobs.get(user_id)
+        if job is None:
+            job = ReportJob(message)
+            self._jobs[user_id] = job
+            job.task = asyncio.create_task(self._run(user_id, job, run))
+        else:
+            logger.info(f"Report for user {user_id} already in flight, joining")
+        # Отмена обработчика не должна прерывать общий для всех нажатий отчет
+        return await asyncio.shield(job.task)
+
+    async def _run(self, user_id: int, job: ReportJob, run: Callable[[StageCallback], Awaitable[None]]) -> bool:
+        try:
+            await job.set_stage("queued")
+            async with self._semaphore:
+                self._running += 1
+                try:
+                    await run(job.set_stage)
+                finally:
+                    self._running -= 1
+            await job.set_stage("done")
+            return True
+        except Exception as e:
+            logger.error(f"Report job for user {user_id} failed: {e}")
+            await job.set_stage("failed", str(e))
+            return False
+        finally:
+            self._jobs.pop(user_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает число выполняемых и ожидающих отчетов"""
+        return {
+            "running": self._running,
+            "queued": len(self._jobs) - self._running
+        }
+
+report_jobs = ReportJobManager(settings.REPORT_MAX_JOBS)
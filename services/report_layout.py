@@ -0,0 +1,105 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+from reportlab.pdfbase import pdfmetrics
+
+@dataclass
+class LayoutLine:
+    """A single line of report text, positioned horizontally."""
+    text: str
+    x: float
+    font_size: int
+    gap_before: float = 0  # Extra vertical space above the line
+    min_y: float = 0  # Start a new page if the line would land below this
+
+# Words whose widths each layout remembers; the least recently used are dropped first
+MAX_CACHED_WORDS = 10000
+
+class TextLayout:
+    """Word-wrapping for one font and size that measures every distinct word once."""
+
+    def __init__(self, font_name: str, font_size: float):
+        self.font_name = font_name
+        self.font_size = font_size
+        self.space_width = pdfmetrics.stringWidth(' ', font_name, font_size)
+        self._widths: "OrderedDict[str, float]" = OrderedDict()
+
+    def word_width(self, word: str) -> float:
+        """Return the width of a word, measuring it only on first use."""
+        width = self._widths.get(word)
+        if width is None:
+            width = pdfmetrics.stringWidth(word, self.font_name, self.font_size)
+            self._widths[word] = width
+            if len(self._widths) > MAX_CACHED_WORDS:
+                self._widths.popitem(last=False)
+        else:
+            self._widths.move_to_end(word)
+        return width
+
+    def line_width(self, text: str) -> float:
+        """Return the width of a line of space-separated words."""
+        words = text.split()
+        if not words:
+            return 0
+        return sum(self.word_width(word) for word in words) + self.space_width * (len(words) - 1)
+
+    def wrap(self, text: str, width: float) -> List[str]:
+        """Split text into lines narrower than ``width`` by accumulating word widths.
+
+        A single word wider than ``width`` gets a line of its own.
+        """
+        lines = []
+        current: List[str] = []
+        current_width = 0.0
+
+        for word in text.split():
+            word_width = self.word_width(word)
+            candidate = current_width + self.space_width + word_width if current else word_width
+            if current and candidate >= width:
+                lines.append(' '.join(current))
+                current = [word]
+                current_width = word_width
+            else:
+                current.append(word)
+                current_width = candidate
+
+        if current:
+            lines.append(' '.join(current))
+        return lines
+
+_layouts: Dict[Tuple[str, float], TextLayout] = {}
+
+def get_layout(font_name: str, font_size: float) -> TextLayout:
+    """Return the shared, width-memoizing layout for a font and size."""
+    key = (font_name, font_size)
+    layout = _layouts.get(key)
+    if layout is None:
+        layout = _layouts[key] = TextLayout(font_name, font_size)
+    return layout
+
+def paginate(lines: List[LayoutLine], top: float, bottom: float, line_height: float) -> List[List[Tuple[LayoutLine, float]]]:
+    """Assign a page and a baseline ``y`` to every line in a single pass."""
+    pages: List[List[Tuple[LayoutLine, float]]] = [[]]
+    y = top
+
+    for line in lines:
+        y -= line.gap_before
+        if y < max(bottom, line.min_y) and pages[-1]:
+            pages.append([])
+            y = top
+        pages[-1].append((line, y))
+        y -= line_height
+
+    return pages
+
+def render_pages(c, pages: List[List[Tuple[LayoutLine, float]]], font_name: str) -> None:
+    """Draw paginated lines onto a reportlab canvas."""
+    for number, page in enumerate(pages):
+        if number:
+            c.showPage()
+        current_size = None
+        for line, y in page:
+            if line.font_size != current_size:
+                c.setFont(font_name, line.font_size)
+                current_size = line.font_size
+            c.drawString(line.x, y, line.text)
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Dict, Optional
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class ReportTimeoutError(Exception):
+    """Отчет не был сформирован за отведенное время"""
+    pass
+
+def _init_worker() -> None:
+    """Регистрирует шрифт при старте воркера, до первого отчета"""
+    from services.report_generator import init_report_assets
+    init_report_assets()
+
+def _render_report(data: Optional[Dict[str, Any]], now: Optional[datetime]) -> bytes:
+    """Формирует PDF в процессе-воркере"""
+    # Импортируем здесь, чтобы reportlab загружался только в воркерах
+    from services.report_generator import build_report_pdf
+    return build_report_pdf(data, now)
+
+class ReportRenderer:
+    """Формирует отчеты в пуле процессов, не блокируя event loop"""
+
+    def __init__(self, max_workers: int, max_concurrency: int, timeout: float):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Лениво создает пул процессов"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        return self._executor
+
+    async def render(
+        self,
+        data: Optional[Dict[str, Any]] = None,
+        now: Optional[datetime] = None,
+        wait_timeout: Optional[float] = None
+    ) -> bytes:
+        """
+        Формирует отчет по снимку данных и возвращает байты PDF.
+        wait_timeout ограничивает ожидание свободного слота, а не сам отчет
+        """
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), wait_timeout)
+        except asyncio.TimeoutError:
+            raise ReportTimeoutError(f"Нет свободного слота за {wait_timeout} с")
+        try:
+            # Вторая попытка — если пул остановили из-за чужого зависшего отчета
+            for attempt in range(2):
+                executor = self._get_executor()
+                task = executor.submit(_render_report, data, now)
+                try:
+                    return await asyncio.wait_for(asyncio.wrap_future(task), self.timeout)
+                except asyncio.TimeoutError:
+                    logger.error(f"Report rendering timed out after {self.timeout}s")
+                    # Отчет, не дождавшийся воркера, просто снимается; зависший воркер
+                    # не должен задерживать следующие отчеты
+                    if not task.cancel():
+                        self._retire(executor, terminate=True)
+                    raise ReportTimeoutError(f"Отчет не сформирован за {self.timeout} с")
+                except BrokenProcessPool as e:
+                    self._retire(executor)
+                    if attempt:
+                        raise ReportTimeoutError(f"Отчет не сформирован: {e}") from e
+                    logger.warning("Report pool was restarted, rendering again")
+                except asyncio.CancelledError:
+                    # Отмена самого вызова пробрасывается, отмена задачи в пуле при остановке — нет
+                    if asyncio.current_task().cancelling():
+                        raise
+                    raise ReportTimeoutError("Отчет не сформирован: пул остановлен")
+        finally:
+            self._semaphore.release()
+
+    def _retire(self, executor: ProcessPoolExecutor, terminate: bool = False) -> None:
+        """
+        Выводит пул из работы; следующий отчет создаст новый. При terminate
+        процессы пула завершаются сразу, а его незавершенные задачи получают
+        BrokenProcessPool и повторяются в новом пуле
+        """
+        if self._executor is executor:
+            self._executor = None
+        if terminate:
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        """Останавливает пул процессов"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+report_renderer = ReportRenderer(
+    max_workers=settings.REPORT_WORKERS,
+    max_concurrency=settings.REPORT_MAX_CONCURRENCY,
+    timeout=settings.REPORT_TIMEOUT
+)
@@ -0,0 +1,35 @@
+import logging
+from datetime import datetime
+from config import settings
+from services.report_cache import report_cache
+from services.report_pool import report_renderer
+from services.storage import get_data_snapshot, user_storage
+
+logger = logging.getLogger(__name__)
+
+async def prerender_reports() -> int:
+    """Заранее формирует отчет по текущим данным и кладет его в кэш"""
+    # Один слот пула всегда остается для запросов пользователей
+    if settings.REPORT_MAX_CONCURRENCY <= 1:
+        logger.info("Report prerender: skipped, the only render slot is kept for users")
+        return 0
+    now = datetime.now()
+    users = user_storage.get_active_users(settings.REPORT_PRERENDER_ACTIVE_DAYS)
+    if not users:
+        logger.info("Report prerender: no active users")
+        return 0
+    # Хранилище пока общее для всех пользователей, поэтому один отчет покрывает всех
+    data = get_data_snapshot()
+    key = report_cache.make_key(data, now.date())
+    if report_cache.has_pdf(key):
+        logger.info(f"Report prerender: report is already cached for {len(users)} active users")
+        return 0
+    try:
+        # Бюджет ограничивает ожидание слота за отчетами пользователей; сам отчет — REPORT_TIMEOUT
+        pdf = await report_renderer.render(data, now, wait_timeout=settings.REPORT_PRERENDER_BUDGET)
+        report_cache.put_pdf(key, pdf)
+    except Exception as e:
+        logger.error(f"Report prerender failed: {e}")
+        return 0
+    logger.info(f"Report prerender: report rendered for {len(users)} active users")
+    return 1
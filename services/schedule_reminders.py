@@ -0,0 +1,122 @@
+"""
+Напоминания о записях расписания
+"""
+import heapq
+import logging
+import time as time_module
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from aiogram import Bot
+from services.digest import digest
+from services.user_scheduler import get_timezone
+
+logger = logging.getLogger(__name__)
+
+class ScheduleReminders:
+    """
+    Очередь ближайших напоминаний по всем записям расписания.
+    Обновляется точечно из событий ScheduleStorage; устаревшие элементы кучи
+    отбрасываются при извлечении по номеру версии записи
+    """
+
+    def __init__(self, misfire_grace: int = 900):
+        self.misfire_grace = misfire_grace
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._versions: Dict[str, int] = {}
+        # Часовые пояса владельцев записей и записи каждого владельца
+        self._user_timezones: Dict[int, Optional[str]] = {}
+        self._user_entries: Dict[int, Set[str]] = {}
+        # (время срабатывания, id записи, версия)
+        self._heap: List[Tuple[float, str, int]] = []
+
+    def load(self, entries: Iterable[Dict[str, Any]], users: Iterable[Dict[str, Any]], now: Optional[float] = None) -> None:
+        """Строит очередь при запуске"""
+        now = time_module.time() if now is None else now
+        self._user_timezones = {user["user_id"]: user.get("timezone") for user in users}
+        self._entries.clear()
+        self._versions.clear()
+        self._user_entries.clear()
+        self._heap = []
+        for entry in entries:
+            self._heap.append(self._register(entry, now))
+        heapq.heapify(self._heap)
+        logger.info(f"Schedule reminders loaded for {len(self._entries)} entries")
+
+    def on_change(self, event: str, entry: Dict[str, Any]) -> None:
+        """Подписчик ScheduleStorage: обновляет одну запись в очереди"""
+        if "id" not in entry:
+            return
+        if event == "delete":
+            self._remove(entry["id"])
+        else:
+            self._push(entry, time_module.time())
+
+    def set_user_timezone(self, user_id: int, timezone: Optional[str]) -> None:
+        """Пересчитывает напоминания пользователя после смены часового пояса"""
+        self._user_timezones[user_id] = timezone
+        now = time_module.time()
+        for entry_id in list(self._user_entries.get(user_id, ())):
+            self._push(self._entries[entry_id], now)
+
+    def collect_due(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Снимает наступившие напоминания и ставит их на следующий день"""
+        now = time_module.time() if now is None else now
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            fire_at, entry_id, version = heapq.heappop(heap)
+            if self._versions.get(entry_id) != version:
+                continue
+            entry = self._entries[entry_id]
+            if now - fire_at <= self.misfire_grace:
+                due.append(entry)
+            heapq.heappush(heap, (self._next_fire(entry, fire_at), entry_id, version))
+        return due
+
+    async def tick(self, bot: Bot) -> None:
+        """Передает наступившие напоминания в сводки; вызывается планировщиком"""
+        for entry in self.collect_due():
+            # Записи без владельца остались от общего расписания и уходят всем
+            chat_ids = [entry["user_id"]] if "user_id" in entry else None
+            digest.enqueue(chat_ids, f"⏰ Напоминание: {entry['time']} — {entry['text']}")
+
+    def _register(self, entry: Dict[str, Any], now: float) -> Tuple[float, str, int]:
+        """Запоминает запись под новой версией и возвращает элемент кучи"""
+        entry_id = entry["id"]
+        self._entries[entry_id] = entry
+        version = self._versions.get(entry_id, -1) + 1
+        self._versions[entry_id] = version
+        if "user_id" in entry:
+            self._user_entries.setdefault(entry["user_id"], set()).add(entry_id)
+        return self._next_fire(entry, now), entry_id, version
+
+    def _push(self, entry: Dict[str, Any], now: float) -> None:
+        heapq.heappush(self._heap, self._register(entry, now))
+        # Изредка вычищаем накопившиеся устаревшие элементы
+        if len(self._heap) > 2 * len(self._entries) + 1000:
+            self._heap = [item for item in self._heap if self._versions.get(item[1]) == item[2]]
+            heapq.heapify(self._heap)
+
+    def _remove(self, entry_id: str) -> None:
+        entry = self._entries.pop(entry_id, None)
+        # Без версии элемент кучи будет отброшен при извлечении
+        self._versions.pop(entry_id, None)
+        if entry and "user_id" in entry:
+            self._user_entries.get(entry["user_id"], set()).discard(entry_id)
+
+    def _next_fire(self, entry: Dict[str, Any], after: float) -> float:
+        """Ближайшее наступление HH:MM записи в поясе владельца строго после after"""
+        tz = get_timezone(self._user_timezones.get(entry.get("user_id")))
+        fire_time = datetime.strptime(entry["time"], "%H:%M").time()
+        day = datetime.fromtimestamp(after, tz).date()
+        while True:
+            fire_at = tz.localize(datetime.combine(day, fire_time)).timestamp()
+            if fire_at > after:
+                return fire_at
+            day += timedelta(days=1)
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает число записей и размер кучи"""
+        return {"entries": len(self._entries), "heap": len(self._heap)}
+
+schedule_reminders = ScheduleReminders()
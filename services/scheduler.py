@@ -1,34 +1,215 @@
+import asyncio
+import logging
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.jobstores.redis import RedisJobStore
+from apscheduler.triggers.base import BaseTrigger
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from aiogram import Bot
 from datetime import time
 from pytz import timezone
+from redis import BlockingConnectionPool
+from redis.asyncio import Redis
+from typing import Any, Callable, Dict
 from handlers.progress import send_checklist_report, send_goals_report, analyze_weekly_productivity
 from handlers.mood import ask_mood
 from services.quote import send_quote
+from services.report_prerender import prerender_reports
+from services.user_scheduler import user_scheduler, DailyJob
+from services.storage import user_storage, schedule_storage, task_storage, goal_storage
+from services.schedule_reminders import schedule_reminders
+from services.deadlines import due_index, send_deadline_reminders
+from services.broadcast import broadcaster
+from services.digest import digest
+from services.outbound import use_lane
+from services.storage_events import storage_events
+from services.leader import LeaderLease
+from config import settings
+
+logger = logging.getLogger(__name__)
 
 tz = timezone("Europe/Moscow")  # Или твой часовой пояс
 
-def setup_jobs(bot: Bot) -> AsyncIOScheduler:
-    """Setup all scheduled jobs and return the scheduler instance"""
-    scheduler = AsyncIOScheduler(timezone=tz)
-    
-    # Утреннее вдохновение
-    scheduler.add_job(send_quote, trigger='cron', hour=6, minute=0, args=[bot])
+# Задачи хранятся в Redis по ссылке на функцию, поэтому бот и аренда
+# передаются не аргументами, а через это состояние процесса
+_runtime: Dict[str, Any] = {
+    "bot": None,
+    "lease": None,
+    "scheduler": None,
+    "lease_task": None,
+    "resume_task": None,
+    "events_task": None
+}
 
-    # Настроение 3 раза в день
-    for hour in [9, 14, 20]:
-        scheduler.add_job(ask_mood, trigger='cron', hour=hour, minute=0, args=[bot])
+def is_leader() -> bool:
+    """Проверяет, что задачи выполняет именно эта реплика"""
+    lease = _runtime["lease"]
+    return lease is not None and lease.is_leader
 
-    # Ежедневный чеклист
-    scheduler.add_job(send_checklist_report, trigger='cron', hour=21, minute=30, args=[bot])
+# ---------- Задачи планировщика ----------
+
+# Запросы из задач планировщика уступают ответам живым пользователям
+
+async def run_user_scheduler_tick():
+    if is_leader():
+        with use_lane("notification"):
+            await user_scheduler.tick(_runtime["bot"])
+
+async def run_schedule_reminders_tick():
+    if is_leader():
+        with use_lane("notification"):
+            await schedule_reminders.tick(_runtime["bot"])
+
+async def run_digest_flush():
+    if is_leader():
+        await digest.flush(_runtime["bot"])
+
+async def run_weekly_analysis():
+    if is_leader():
+        with use_lane("notification"):
+            await analyze_weekly_productivity(_runtime["bot"])
+
+async def run_prerender_reports():
+    if is_leader():
+        await prerender_reports()
+
+# ---------- Смена ведущей реплики ----------
+
+def on_user_change(event: str, user: Dict[str, Any]) -> None:
+    """Подписчик UserStorage: переносит нового пользователя или его настройки в очереди"""
+    chat_id = user.get("chat_id", user["user_id"])
+    user_scheduler.add_user(user["user_id"], chat_id, user.get("timezone"))
+    schedule_reminders.set_user_timezone(user["user_id"], user.get("timezone"))
+    digest.set_prefs(chat_id, user.get("timezone"), user.get("quiet_hours"))
+
+def load_indexes() -> None:
+    """Строит очереди рассылок и напоминаний по текущим данным"""
+    users = user_storage.get_users()
+    # Администратор получает рассылки, даже если еще не писал боту
+    if settings.USER_ID and all(user["user_id"] != settings.USER_ID for user in users):
+        users.append({"user_id": settings.USER_ID})
+    user_scheduler.load_users(users)
+    due_index.attach("tasks", task_storage)
+    due_index.attach("goals", goal_storage)
+    schedule_reminders.load(schedule_storage.get_schedule(), users)
+    schedule_storage.add_listener(schedule_reminders.on_change)
+    user_storage.add_listener(on_user_change)
+    digest.load_prefs(users)
+    digest.load()
+
+async def on_elected() -> None:
+    scheduler = _runtime["scheduler"]
+    # Срабатывания, пропущенные пока ведущей реплики не было, досылаются из кучи
+    await user_scheduler.restore(_runtime["lease"].redis, f"{settings.SCHEDULER_KEY_PREFIX}:user_fired")
+    # Пока реплика была ведомой, данные могли меняться на других репликах
+    load_indexes()
+    if scheduler.running:
+        scheduler.resume()
+    else:
+        scheduler.start()
+    # Только ведущая реплика дорассылает прерванные рассылки
+    _runtime["resume_task"] = asyncio.create_task(broadcaster.resume_pending(_runtime["bot"]))
+    # Изменения данных в других процессах и репликах обновляют очереди этой
+    _runtime["events_task"] = asyncio.create_task(storage_events.run(_runtime["lease"].redis, resync=load_indexes))
 
+async def on_demoted() -> None:
+    scheduler = _runtime["scheduler"]
+    if scheduler.running:
+        scheduler.pause()
+    if _runtime["events_task"] is not None:
+        _runtime["events_task"].cancel()
+        _runtime["events_task"] = None
+
+# ---------- Настройка ----------
+
+def ensure_job(scheduler: AsyncIOScheduler, jobstore: RedisJobStore, func: Callable, trigger: BaseTrigger, job_id: str) -> None:
+    """
+    Добавляет задачу, не затирая сохраненную: иначе после перезапуска
+    пропущенный запуск потерялся бы вместе со старым next_run_time
+    """
+    existing = jobstore.lookup_job(job_id)
+    if existing is not None and existing.func is func and str(existing.trigger) == str(trigger):
+        return
+    scheduler.add_job(func, trigger=trigger, id=job_id, replace_existing=True)
+
+def setup_jobs(bot: Bot, redis_client: Redis) -> AsyncIOScheduler:
+    """
+    Setup all scheduled jobs and return the scheduler instance.
+
+    Jobs persist in Redis; the scheduler runs only while this replica
+    holds the leader lease.
+    """
+    jobstore = RedisJobStore(
+        jobs_key=f"{settings.SCHEDULER_KEY_PREFIX}:jobs",
+        run_times_key=f"{settings.SCHEDULER_KEY_PREFIX}:run_times",
+        # Те же ограничения и таймауты, что у общего асинхронного пула
+        connection_pool=BlockingConnectionPool.from_url(
+            settings.redis_url,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_keepalive=True,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            retry_on_timeout=True
+        )
+    )
+    scheduler = AsyncIOScheduler(
+        timezone=tz,
+        jobstores={"default": jobstore},
+        job_defaults={
+            # Пропущенные за время простоя запуски сливаются в один
+            "coalesce": True,
+            "misfire_grace_time": settings.SCHEDULER_MISFIRE_GRACE,
+            "max_instances": 1
+        }
+    )
+    _runtime.update(bot=bot, scheduler=scheduler)
+
+    # Рассылки по местному времени каждого пользователя: одна куча вместо задачи на пользователя
+    user_scheduler.add_job(DailyJob("quote", (time(6, 0),), send_quote))
+    # Утренние напоминания о дедлайнах
+    user_scheduler.add_job(DailyJob("deadlines", (time(8, 0),), send_deadline_reminders))
+    # Настроение 3 раза в день
+    user_scheduler.add_job(DailyJob("mood", (time(9, 0), time(14, 0), time(20, 0)), ask_mood))
+    # Ежедневный чеклист
+    user_scheduler.add_job(DailyJob("checklist", (time(21, 30),), send_checklist_report))
     # Еженедельный отчёт по целям
-    scheduler.add_job(send_goals_report, trigger='cron', day_of_week='sun', hour=21, minute=0, args=[bot])
-    scheduler.add_job(analyze_weekly_productivity, trigger='cron', day_of_week='sun', hour=21, minute=15, args=[bot])
+    user_scheduler.add_job(DailyJob("goals", (time(21, 0),), send_goals_report, weekday=6))
+    ensure_job(scheduler, jobstore, run_user_scheduler_tick, IntervalTrigger(seconds=30, timezone=tz), 'user_scheduler_tick')
+
+    # Напоминания о записях расписания; очередь обновляется при каждом изменении записи
+    ensure_job(scheduler, jobstore, run_schedule_reminders_tick, IntervalTrigger(seconds=30, timezone=tz), 'schedule_reminders_tick')
+
+    # Сводки: уведомления за окно DIGEST_WINDOW уходят одним сообщением
+    ensure_job(scheduler, jobstore, run_digest_flush, IntervalTrigger(seconds=15, timezone=tz), 'digest_flush')
+
+    # Еженедельный анализ продуктивности
+    ensure_job(scheduler, jobstore, run_weekly_analysis,
+               CronTrigger(day_of_week='sun', hour=21, minute=15, jitter=settings.SCHEDULER_JITTER, timezone=tz),
+               'weekly_analysis')
+
+    # Ночная подготовка отчетов до утреннего пика
+    ensure_job(scheduler, jobstore, run_prerender_reports,
+               CronTrigger(hour=4, minute=30, jitter=settings.SCHEDULER_JITTER, timezone=tz),
+               'prerender_reports')
+
+    # Планировщик запустится, когда реплика получит аренду лидера
+    lease = LeaderLease(redis_client, f"{settings.SCHEDULER_KEY_PREFIX}:leader", settings.SCHEDULER_LEASE_TTL)
+    _runtime["lease"] = lease
+    _runtime["lease_task"] = asyncio.create_task(lease.run(on_elected, on_demoted))
 
-    # Запуск планировщика
-    scheduler.start()
-    
     return scheduler
 
-__all__ = ['scheduler', 'setup_jobs']
+async def shutdown_jobs() -> None:
+    """Stop the scheduler and hand the leader lease to another replica."""
+    for task_key in ("lease_task", "resume_task", "events_task"):
+        if _runtime[task_key] is not None:
+            _runtime[task_key].cancel()
+    scheduler = _runtime["scheduler"]
+    if scheduler is not None and scheduler.running:
+        scheduler.shutdown(wait=False)
+    if _runtime["lease"] is not None:
+        await _runtime["lease"].release()
+
+__all__ = ['scheduler', 'setup_jobs', 'shutdown_jobs', 'is_leader']
@@ -0,0 +1,179 @@
+"""
+Очереди обновлений по шардам для нескольких процессов-обработчиков.
+Обновления одного пользователя всегда попадают в один шард и
+обрабатываются по порядку, обновления разных пользователей — параллельно
+"""
+import asyncio
+import json
+import logging
+import zlib
+from typing import Any, Dict, List, Optional
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramServerError, TelegramRetryAfter
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from services.webhook import UpdateFeed
+
+logger = logging.getLogger(__name__)
+
+# Возвращает в очередь обновления, взятые процессом, который упал, не завершив их
+REQUEUE_SCRIPT = """
+local count = 0
+while true do
+    local update = redis.call('lpop', KEYS[1])
+    if not update then
+        break
+    end
+    redis.call('rpush', KEYS[2], update)
+    count = count + 1
+end
+return count
+"""
+
+def get_update_user_id(update: Dict[str, Any]) -> Optional[int]:
+    """Находит пользователя или чат, к которому относится обновление"""
+    for key, payload in update.items():
+        if key == "update_id" or not isinstance(payload, dict):
+            continue
+        for field in ("from", "user"):
+            if isinstance(payload.get(field), dict):
+                return payload[field]["id"]
+        if isinstance(payload.get("chat"), dict):
+            return payload["chat"]["id"]
+    return None
+
+def shard_for(update: Dict[str, Any], shards: int) -> int:
+    user_id = get_update_user_id(update)
+    if user_id is None:
+        # Опросы и прочие обновления без пользователя распределяются по id обновления
+        return update.get("update_id", 0) % shards
+    return zlib.crc32(str(user_id).encode()) % shards
+
+class UpdateQueue:
+    """
+    Списки Redis по шардам. Взятое обновление перекладывается в список
+    обрабатываемых и удаляется из него после обработки, поэтому падение
+    процесса не теряет обновления
+    """
+
+    def __init__(self, redis: Redis, prefix: str, shards: int):
+        self.redis = redis
+        self.prefix = prefix
+        self.shards = shards
+
+    def shard_key(self, shard: int) -> str:
+        return f"{self.prefix}:shard:{shard}"
+
+    def processing_key(self, shard: int) -> str:
+        return f"{self.prefix}:shard:{shard}:processing"
+
+    def metrics_key(self, shard: int) -> str:
+        return f"{self.prefix}:metrics:{shard}"
+
+    async def push(self, update: Dict[str, Any]) -> None:
+        shard = shard_for(update, self.shards)
+        await self.redis.lpush(self.shard_key(shard), json.dumps(update, ensure_ascii=False))
+
+    async def pop(self, shard: int, timeout: int = 1) -> Optional[str]:
+        return await self.redis.brpoplpush(self.shard_key(shard), self.processing_key(shard), timeout)
+
+    async def ack(self, shard: int, raw: str) -> None:
+        await self.redis.lrem(self.processing_key(shard), 1, raw)
+
+    async def requeue_processing(self, shard: int) -> int:
+        """Возвращает незавершенные обновления в начало очереди шарда"""
+        return await self.redis.eval(REQUEUE_SCRIPT, 2, self.processing_key(shard), self.shard_key(shard))
+
+    async def depths(self) -> List[int]:
+        """Длина очереди каждого шарда"""
+        pipe = self.redis.pipeline()
+        for shard in range(self.shards):
+            pipe.llen(self.shard_key(shard))
+        return await pipe.execute()
+
+class ShardWorker:
+    """Обработчик одного шарда в отдельном процессе"""
+
+    def __init__(self, queue: UpdateQueue, shard: int, feed: UpdateFeed, concurrency: int):
+        self.queue = queue
+        self.shard = shard
+        self.feed = feed
+        self._slots = asyncio.Semaphore(concurrency)
+        # Последняя задача каждого пользователя: следующее обновление ждет ее завершения
+        self._tails: Dict[int, asyncio.Task] = {}
+        self._tasks: set = set()
+        self.processed = 0
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """Берет обновления из очереди шарда, пока не установлен stop"""
+        requeued = await self.queue.requeue_processing(self.shard)
+        if requeued:
+            logger.info(f"Shard {self.shard}: requeued {requeued} unfinished updates")
+        logger.info(f"Shard {self.shard} worker started")
+        while not stop.is_set():
+            await self._slots.acquire()
+            try:
+                raw = await self.queue.pop(self.shard)
+            except RedisError as e:
+                self._slots.release()
+                logger.warning(f"Shard {self.shard}: failed to read queue: {e}")
+                await asyncio.sleep(1)
+                continue
+            if raw is None:
+                self._slots.release()
+                continue
+            self._start(raw)
+        if self._tasks:
+            await asyncio.wait(set(self._tasks))
+        logger.info(f"Shard {self.shard} worker stopped after {self.processed} updates")
+
+    def _start(self, raw: str) -> None:
+        update = json.loads(raw)
+        user_id = get_update_user_id(update)
+        previous = self._tails.get(user_id) if user_id is not None else None
+        task = asyncio.create_task(self._handle(raw, update, previous))
+        self._tasks.add(task)
+        if user_id is not None:
+            self._tails[user_id] = task
+        task.add_done_callback(lambda done: self._on_done(done, user_id))
+
+    def _on_done(self, task: asyncio.Task, user_id: Optional[int]) -> None:
+        self._tasks.discard(task)
+        self._slots.release()
+        if self._tails.get(user_id) is task:
+            del self._tails[user_id]
+
+    async def _handle(self, raw: str, update: Dict[str, Any], previous: Optional[asyncio.Task]) -> None:
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await self.feed(update)
+        except Exception as e:
+            logger.error(f"Shard {self.shard}: failed to process update {update.get('update_id')}: {e}")
+        self.processed += 1
+        try:
+            await self.queue.ack(self.shard, raw)
+        except RedisError as e:
+            logger.warning(f"Shard {self.shard}: failed to ack update {update.get('update_id')}: {e}")
+
+async def poll_updates(bot: Bot, queue: UpdateQueue, allowed_updates: List[str], stop: asyncio.Event) -> None:
+    """
+    Получает обновления long polling'ом и раскладывает по шардам.
+    Смещение сдвигается только после записи в очередь, поэтому обновление
+    не теряется, даже если Redis недоступен
+    """
+    offset = None
+    backoff = 1
+    while not stop.is_set():
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=30, allowed_updates=allowed_updates)
+            for update in updates:
+                await queue.push(update.model_dump(mode="json", exclude_unset=True, by_alias=True))
+                offset = update.update_id + 1
+            backoff = 1
+        except TelegramRetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+        except (TelegramNetworkError, TelegramServerError, RedisError) as e:
+            logger.warning(f"Update polling failed, retrying in {backoff}s: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
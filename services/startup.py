@@ -0,0 +1,96 @@
+"""
+Запуск бота по шагам: независимые шаги идут параллельно, неудачные
+повторяются с экспоненциальной задержкой, а текущая стадия видна в /health
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class StartupError(Exception):
+    """Шаг запуска не удался после всех попыток"""
+    pass
+
+class Startup:
+    """Состояние запуска процесса"""
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.started_at = time.monotonic()
+        self.stage = "starting"
+        self.ready = False
+        self.error: Optional[str] = None
+        self.duration: Optional[float] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+
+    def set_stage(self, stage: str) -> None:
+        self.stage = stage
+        logger.info(f"Startup stage: {stage}")
+
+    async def step(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        attempts: int = 6,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0
+    ) -> Any:
+        """Выполняет шаг, повторяя его с экспоненциальной задержкой и разбросом"""
+        state = self.steps[name] = {"status": "running", "attempts": 0, "duration": None}
+        started = time.monotonic()
+        for attempt in range(1, attempts + 1):
+            state["attempts"] = attempt
+            try:
+                result = await func()
+            except Exception as e:
+                state["error"] = str(e)
+                if attempt == attempts:
+                    state["status"] = "failed"
+                    raise StartupError(f"Startup step {name} failed after {attempt} attempts: {e}") from e
+                delay = min(max_delay, base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+                state["status"] = "retrying"
+                logger.warning(f"Startup step {name} failed (attempt {attempt}/{attempts}), retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                continue
+            state["status"] = "done"
+            state.pop("error", None)
+            state["duration"] = round(time.monotonic() - started, 3)
+            return result
+
+    async def run_parallel(self, stage: str, steps: Dict[str, Callable[[], Awaitable[Any]]]) -> Dict[str, Any]:
+        """Выполняет независимые шаги одновременно и возвращает их результаты по имени"""
+        self.set_stage(stage)
+        results = await asyncio.gather(*(self.step(name, func) for name, func in steps.items()))
+        return dict(zip(steps, results))
+
+    def finish(self) -> None:
+        """Отмечает готовность и проверяет, уложился ли запуск в бюджет"""
+        self.duration = round(time.monotonic() - self.started_at, 3)
+        self.ready = True
+        self.set_stage("ready")
+        slowest = max(self.steps.items(), key=lambda item: item[1]["duration"] or 0, default=(None, None))[0]
+        if self.duration > self.budget:
+            logger.warning(f"Startup took {self.duration:.1f}s, over the {self.budget:.0f}s budget (slowest step: {slowest})")
+        else:
+            logger.info(f"Startup finished in {self.duration:.1f}s (budget {self.budget:.0f}s, slowest step: {slowest})")
+
+    def fail(self, error: str) -> None:
+        self.error = error
+        self.set_stage("failed")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Состояние запуска для /health"""
+        return {
+            "stage": self.stage,
+            "ready": self.ready,
+            "elapsed": round(time.monotonic() - self.started_at, 3),
+            "duration": self.duration,
+            "error": self.error,
+            "steps": self.steps
+        }
+
+startup = Startup(settings.STARTUP_BUDGET)
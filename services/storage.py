@@ -1,11 +1,17 @@
+import asyncio
+import fcntl
 import json
 import logging
 import os
-from typing import List, Dict, Any, Optional
+import time
+import uuid
+from typing import List, Dict, Any, Optional, Iterable, Callable
 from datetime import datetime, timedelta
 from pathlib import Path
 from dataclasses import dataclass
 from config import settings
+from services.metrics import STORAGE_SECONDS, STORAGE_BYTES, STORAGE_LOCK_WAIT
+from services.tracing import span
 import re
 
 # Настройка логирования
@@ -33,28 +39,163 @@ class ValidationRules:
 class BaseStorage:
     """Базовый класс для работы с JSON хранилищем"""
     
+    # Проставлять ли записям постоянный id при сохранении
+    assign_ids = False
+    # Подписчики общие для всех экземпляров, работающих с одним файлом
+    _listeners_by_file: Dict[str, List[Callable[[str, Dict[str, Any]], None]]] = {}
+    _save_listeners_by_file: Dict[str, List[Callable[[List[Dict[str, Any]]], None]]] = {}
+    # Файл межпроцессной блокировки; задается, когда с данными работают несколько процессов
+    lock_path: Optional[str] = None
+    _lock_fd: Optional[int] = None
+    
     def __init__(self, filename: str):
         self.filename = filename
+        self._listeners = BaseStorage._listeners_by_file.setdefault(filename, [])
+        self._save_listeners = BaseStorage._save_listeners_by_file.setdefault(filename, [])
         os.makedirs(os.path.dirname(filename), exist_ok=True)
         if not os.path.exists(filename):
             self.save_data([])
         self.validation_rules = ValidationRules()
     
+    @classmethod
+    def share_between_processes(cls, lock_path: str) -> None:
+        """Включает блокировку файлов данных для нескольких процессов-обработчиков"""
+        cls.lock_path = lock_path
+    
+    @classmethod
+    async def acquire_lock(cls) -> None:
+        """
+        Захватывает общую блокировку до конца текущего шага цикла событий.
+        Вызывается перед чтением-изменением-записью без await между ними;
+        если блокировку держит другой процесс, ожидание идет в потоке и не
+        останавливает остальные обновления
+        """
+        if cls.lock_path is None or BaseStorage._lock_fd is not None:
+            return
+        # Одна блокировка на все файлы: порядок захвата не важен и взаимных блокировок нет
+        fd = os.open(cls.lock_path, os.O_RDWR | os.O_CREAT)
+        started = time.perf_counter()
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+            raise
+        STORAGE_LOCK_WAIT.observe(time.perf_counter() - started)
+        if BaseStorage._lock_fd is not None:
+            # Пока шли ожидания, блокировку этого шага уже взял другой обработчик процесса
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+            return
+        BaseStorage._lock_fd = fd
+        asyncio.get_running_loop().call_soon(cls._unlock)
+    
+    @classmethod
+    def _check_locked(cls) -> None:
+        """
+        Запись без блокировки допустима, только если с данными работает один процесс.
+        Иначе запись идет из цикла событий после acquire_lock; свободную
+        блокировку забираем сразу, а ждать ее синхронно нельзя
+        """
+        if cls.lock_path is None or BaseStorage._lock_fd is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            raise StorageError("Запись вне цикла событий не поддерживается, когда данные общие для процессов")
+        fd = os.open(cls.lock_path, os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            logger.error("Storage write without acquire_lock while another process holds the lock")
+            raise FileAccessError("Хранилище занято другим процессом")
+        BaseStorage._lock_fd = fd
+        loop.call_soon(cls._unlock)
+    
+    @staticmethod
+    def _unlock() -> None:
+        fd, BaseStorage._lock_fd = BaseStorage._lock_fd, None
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+    
     def load_data(self) -> List[Dict[str, Any]]:
         """Загружает данные из JSON файла"""
+        started = time.perf_counter()
         try:
-            with open(self.filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with span("storage.load", file=os.path.basename(self.filename)), open(self.filename, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                size = os.fstat(f.fileno()).st_size
         except Exception as e:
             raise StorageError(f"Ошибка при загрузке данных: {str(e)}")
+        self._observe("load", started, size)
+        return data
     
     def save_data(self, data: List[Dict[str, Any]]) -> None:
         """Сохраняет данные в JSON файл"""
+        if self.assign_ids:
+            for item in data:
+                if "id" not in item:
+                    item["id"] = uuid.uuid4().hex
+        self._check_locked()
+        started = time.perf_counter()
         try:
-            with open(self.filename, 'w', encoding='utf-8') as f:
+            # Запись через временный файл: другой процесс не прочитает файл наполовину
+            tmp_path = f"{self.filename}.{os.getpid()}.tmp"
+            with span("storage.save", file=os.path.basename(self.filename)), open(tmp_path, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, self.filename)
         except Exception as e:
             raise StorageError(f"Ошибка при сохранении данных: {str(e)}")
+        self._observe("save", started, size)
+        self._notify_saved(data)
+    
+    def assign_missing_ids(self) -> int:
+        """Проставляет id старым записям; вызывается при запуске, пока процесс один"""
+        data = self.load_data()
+        missing = sum(1 for item in data if "id" not in item)
+        if missing:
+            self.save_data(data)
+            logger.info(f"Assigned ids to {missing} records in {self.filename}")
+        return missing
+    
+    def _observe(self, operation: str, started: float, size: int) -> None:
+        name = os.path.basename(self.filename)
+        STORAGE_SECONDS.observe(time.perf_counter() - started, file=name, operation=operation)
+        STORAGE_BYTES.inc(size, file=name, operation=operation)
+    
+    def reload(self) -> None:
+        """Перечитывает файл, измененный другим процессом, и оповещает подписчиков сохранений"""
+        self._notify_saved(self.load_data())
+    
+    def _notify_saved(self, data: List[Dict[str, Any]]) -> None:
+        for callback in self._save_listeners:
+            try:
+                callback(data)
+            except Exception as e:
+                logger.error(f"Storage save listener failed for {self.filename}: {e}")
+    
+    def add_save_listener(self, callback: Callable[[List[Dict[str, Any]]], None]) -> None:
+        """Подписывает обработчик на каждое сохранение файла: callback(все записи)"""
+        if callback not in self._save_listeners:
+            self._save_listeners.append(callback)
+    
+    def add_listener(self, callback: Callable[[str, Dict[str, Any]], None]) -> None:
+        """Подписывает обработчик на изменения записей: callback(событие, запись)"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+    
+    def notify(self, event: str, item: Dict[str, Any]) -> None:
+        """Сообщает подписчикам об изменении записи"""
+        for callback in self._listeners:
+            try:
+                callback(event, item)
+            except Exception as e:
+                logger.error(f"Storage listener failed on {event}: {e}")
     
     def validate_text(self, text: str) -> None:
         """Проверяет текст на соответствие правилам"""
@@ -119,6 +260,8 @@ class BaseStorage:
 class TaskStorage(BaseStorage):
     """Класс для работы с задачами"""
     
+    assign_ids = True
+    
     def __init__(self):
         super().__init__(settings.CHECKLIST_PATH)
         self.validation_rules.allowed_priorities = ("высокий", "средний", "низкий")
@@ -144,19 +287,99 @@ class TaskStorage(BaseStorage):
         })
         self.save_data(tasks)
     
+    def add_tasks(self, items: Iterable[Dict[str, Any]]) -> int:
+        """Добавляет несколько задач за одну запись"""
+        items = list(items)
+        for item in items:
+            self.validate_text(item["text"])
+            self.validate_priority(item.get("priority", "средний"))
+            self.validate_deadline(item.get("deadline"))
+        
+        if not items:
+            return 0
+        
+        created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        tasks = self.get_tasks()
+        tasks.extend({
+            "text": item["text"].strip(),
+            "priority": item.get("priority", "средний"),
+            "deadline": item.get("deadline"),
+            "completed": False,
+            "created_at": created_at,
+            "type": "task"
+        } for item in items)
+        self.save_data(tasks)
+        return len(items)
+    
     def update_task_status(self, index: int, completed: bool) -> None:
         """Обновляет статус задачи"""
         tasks = self.get_tasks()
         if not 0 <= index < len(tasks):
             raise ValidationError("Неверный индекс задачи")
         
-        tasks[index]["completed"] = completed
+        self._set_completed(tasks[index], completed)
+        self.save_data(tasks)
+
+    def update_tasks(self, task_ids: Iterable[str], completed: Optional[bool] = None, priority: Optional[str] = None) -> int:
+        """
+        Обновляет статус и/или приоритет нескольких задач за одну запись.
+        Задачи, удаленные с момента выбора, пропускаются
+        """
+        if priority is not None:
+            self.validate_priority(priority)
+        
+        task_ids = set(task_ids)
+        tasks = self.get_tasks()
+        selected = [task for task in tasks if task["id"] in task_ids]
+        for task in selected:
+            if completed is not None:
+                self._set_completed(task, completed)
+            if priority is not None:
+                task["priority"] = priority
+        
+        if selected:
+            self.save_data(tasks)
+        return len(selected)
+
+    def delete_tasks(self, task_ids: Iterable[str]) -> int:
+        """Удаляет несколько задач за одну запись; уже удаленные пропускаются"""
+        task_ids = set(task_ids)
+        tasks = self.get_tasks()
+        remaining = [task for task in tasks if task["id"] not in task_ids]
+        removed = len(tasks) - len(remaining)
+        if removed:
+            self.save_data(remaining)
+        return removed
+
+    def complete_all(self) -> int:
+        """Отмечает все невыполненные задачи выполненными"""
+        tasks = self.get_tasks()
+        pending = [task for task in tasks if not task.get("completed", False)]
+        for task in pending:
+            self._set_completed(task, True)
+        
+        if pending:
+            self.save_data(tasks)
+        return len(pending)
+
+    def clear_completed(self) -> int:
+        """Удаляет все выполненные задачи"""
+        tasks = self.get_tasks()
+        remaining = [task for task in tasks if not task.get("completed", False)]
+        removed = len(tasks) - len(remaining)
+        
+        if removed:
+            self.save_data(remaining)
+        return removed
+
+    @staticmethod
+    def _set_completed(task: Dict[str, Any], completed: bool) -> None:
+        """Проставляет статус выполнения и время завершения"""
+        task["completed"] = completed
         if completed:
-            tasks[index]["completed_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            task["completed_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         else:
-            tasks[index].pop("completed_at", None)
-        
-        self.save_data(tasks)
+            task.pop("completed_at", None)
 
     def get_sorted_tasks(self, sort_by: str = "priority", reverse: bool = False) -> List[Dict[str, Any]]:
         """Получает отсортированный список задач"""
@@ -166,6 +389,8 @@ class TaskStorage(BaseStorage):
 class GoalStorage(BaseStorage):
     """Класс для работы с целями"""
     
+    assign_ids = True
+    
     def __init__(self):
         super().__init__(settings.GOALS_PATH)
         self.validation_rules.allowed_priorities = ("высокий", "средний", "низкий")
@@ -250,6 +475,8 @@ class MoodStorage(BaseStorage):
 class ScheduleStorage(BaseStorage):
     """Класс для работы с расписанием"""
     
+    assign_ids = True
+    
     def __init__(self):
         super().__init__(settings.SCHEDULE_PATH)
     
@@ -262,7 +489,7 @@ class ScheduleStorage(BaseStorage):
         schedule = self.get_schedule()
         return sorted(schedule, key=lambda x: datetime.strptime(x.get("time", "00:00"), "%H:%M"))
     
-    def add_entry(self, time: str, text: str) -> None:
+    def add_entry(self, time: str, text: str, user_id: Optional[int] = None) -> None:
         """Добавляет новую запись в расписание"""
         if not self.validate_time_format(time):
             raise ValidationError("Неверный формат времени. Используйте HH:MM")
@@ -270,44 +497,57 @@ class ScheduleStorage(BaseStorage):
         self.validate_text(text)
         
         schedule = self.get_schedule()
-        schedule.append({
+        entry = {
+            "id": uuid.uuid4().hex,
             "time": time,
             "text": text.strip(),
             "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        })
+        }
+        if user_id is not None:
+            entry["user_id"] = user_id
+        schedule.append(entry)
         self.save_data(schedule)
+        self.notify("add", entry)
     
-    def update_entry_text(self, index: int, new_text: str) -> None:
+    def get_entry(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        """Возвращает запись по id или None"""
+        return next((entry for entry in self.get_schedule() if entry["id"] == entry_id), None)
+    
+    @staticmethod
+    def _entry_index(schedule: List[Dict[str, Any]], entry_id: str) -> int:
+        for i, entry in enumerate(schedule):
+            if entry["id"] == entry_id:
+                return i
+        raise ValidationError("Запись не найдена")
+    
+    def update_entry_text(self, entry_id: str, new_text: str) -> None:
         """Обновляет текст записи в расписании"""
         self.validate_text(new_text)
         schedule = self.get_schedule()
-        
-        if not 0 <= index < len(schedule):
-            raise ValidationError("Неверный индекс записи")
+        index = self._entry_index(schedule, entry_id)
         
         schedule[index]["text"] = new_text.strip()
         self.save_data(schedule)
+        self.notify("update", schedule[index])
     
-    def update_entry_time(self, index: int, new_time: str) -> None:
+    def update_entry_time(self, entry_id: str, new_time: str) -> None:
         """Обновляет время записи в расписании"""
         if not self.validate_time_format(new_time):
             raise ValidationError("Неверный формат времени. Используйте HH:MM")
         
         schedule = self.get_schedule()
-        if not 0 <= index < len(schedule):
-            raise ValidationError("Неверный индекс записи")
+        index = self._entry_index(schedule, entry_id)
         
         schedule[index]["time"] = new_time
         self.save_data(schedule)
+        self.notify("update", schedule[index])
     
-    def delete_entry(self, index: int) -> Dict[str, Any]:
+    def delete_entry(self, entry_id: str) -> Dict[str, Any]:
         """Удаляет запись из расписания и возвращает удаленную запись"""
         schedule = self.get_schedule()
-        if not 0 <= index < len(schedule):
-            raise ValidationError("Неверный индекс записи")
-        
-        deleted = schedule.pop(index)
+        deleted = schedule.pop(self._entry_index(schedule, entry_id))
         self.save_data(schedule)
+        self.notify("delete", deleted)
         return deleted
     
     @staticmethod
@@ -319,8 +559,88 @@ class ScheduleStorage(BaseStorage):
         except ValueError:
             return False
 
+class UserStorage(BaseStorage):
+    """Класс для работы с зарегистрированными пользователями"""
+    
+    def __init__(self):
+        super().__init__(settings.USERS_PATH)
+    
+    def get_users(self) -> List[Dict[str, Any]]:
+        """Получает список всех пользователей"""
+        return self.load_data()
+    
+    def touch_user(self, user_id: int, chat_id: Optional[int] = None) -> bool:
+        """
+        Регистрирует пользователя или обновляет время его последней активности
+        :return: True, если пользователь новый
+        """
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        users = self.get_users()
+        
+        for user in users:
+            if user["user_id"] == user_id:
+                user["last_seen"] = now
+                if chat_id is not None:
+                    user["chat_id"] = chat_id
+                created = False
+                break
+        else:
+            users.append({
+                "user_id": user_id,
+                "chat_id": chat_id if chat_id is not None else user_id,
+                "first_seen": now,
+                "last_seen": now
+            })
+            created = True
+        self.save_data(users)
+        if created:
+            self.notify("add", users[-1])
+        return created
+    
+    def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Получает пользователя по идентификатору"""
+        for user in self.get_users():
+            if user["user_id"] == user_id:
+                return user
+        return None
+    
+    def update_user(self, user_id: int, **fields: Any) -> Dict[str, Any]:
+        """Обновляет поля пользователя и возвращает его запись"""
+        users = self.get_users()
+        for user in users:
+            if user["user_id"] == user_id:
+                user.update(fields)
+                break
+        else:
+            raise StorageError(f"Пользователь {user_id} не найден")
+        self.save_data(users)
+        self.notify("update", user)
+        return user
+    
+    def set_timezone(self, user_id: int, timezone: str) -> Dict[str, Any]:
+        """Сохраняет часовой пояс пользователя"""
+        return self.update_user(user_id, timezone=timezone)
+    
+    def set_quiet_hours(self, user_id: int, quiet_hours: Optional[Dict[str, str]]) -> Dict[str, Any]:
+        """Сохраняет тихие часы пользователя: {"start": "HH:MM", "end": "HH:MM"} или None"""
+        return self.update_user(user_id, quiet_hours=quiet_hours)
+    
+    def get_active_users(self, days: int = 7) -> List[Dict[str, Any]]:
+        """Получает пользователей, активных за последние n дней"""
+        cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+        return [user for user in self.get_users() if user.get("last_seen", "") >= cutoff]
+
 # Инициализация хранилищ
 task_storage = TaskStorage()
 goal_storage = GoalStorage()
 mood_storage = MoodStorage()
-schedule_storage = ScheduleStorage()
\ No newline at end of file
+schedule_storage = ScheduleStorage()
+user_storage = UserStorage()
+
+def get_data_snapshot() -> Dict[str, List[Dict[str, Any]]]:
+    """Возвращает снимок целей, задач и настроений для отчетов"""
+    return {
+        "goals": goal_storage.get_goals(),
+        "tasks": task_storage.get_tasks(),
+        "moods": mood_storage.get_moods()
+    }
@@ -0,0 +1,133 @@
+"""
+Передача событий хранилищ между процессами через Redis pub/sub.
+Индексы рассылок и напоминаний живут в ведущем процессе, а данные
+меняют процессы-обработчики: события их хранилищ пересылаются ведущему
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+from typing import Any, Callable, Dict, Iterable, Optional
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from services.storage import BaseStorage, schedule_storage, user_storage, task_storage, goal_storage
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class StorageEventBridge:
+    """Публикует изменения хранилищ и воспроизводит чужие изменения локально"""
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.origin = f"{socket.gethostname()}:{os.getpid()}"
+        self._storages: Dict[str, BaseStorage] = {}
+        self._redis: Optional[Redis] = None
+        self._listeners: Dict[tuple, Any] = {}
+        self._tasks: set = set()
+        # Пока применяется чужое событие, локальные подписчики не публикуют его снова
+        self._applying = False
+
+    def publish_from(self, redis: Redis, events: Iterable[BaseStorage], saves: Iterable[BaseStorage]) -> None:
+        """
+        Подписывается на изменения хранилищ этого процесса
+        :param events: хранилища, чьи события записей пересылаются как есть
+        :param saves: хранилища, после сохранения которых получатель перечитывает файл
+        """
+        self._redis = redis
+        for storage in events:
+            self._storages[storage.filename] = storage
+            storage.add_listener(self._make_listener(storage.filename))
+        for storage in saves:
+            self._storages[storage.filename] = storage
+            storage.add_save_listener(self._make_save_listener(storage.filename))
+
+    def _make_listener(self, filename: str):
+        # Один подписчик на файл: повторная настройка не дублирует публикации
+        key = ("event", filename)
+        if key not in self._listeners:
+            self._listeners[key] = lambda event, item: self._publish(filename, event, item)
+        return self._listeners[key]
+
+    def _make_save_listener(self, filename: str):
+        key = ("save", filename)
+        if key not in self._listeners:
+            self._listeners[key] = lambda items: self._publish(filename, "save", None)
+        return self._listeners[key]
+
+    def _publish(self, filename: str, event: str, item: Optional[Dict[str, Any]]) -> None:
+        if self._applying or self._redis is None:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Сохранение вне цикла событий, например из служебного скрипта
+            return
+        message = json.dumps({"origin": self.origin, "file": filename, "event": event, "item": item}, ensure_ascii=False)
+        task = asyncio.create_task(self._send(message))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, message: str) -> None:
+        try:
+            await self._redis.publish(self.channel, message)
+        except RedisError as e:
+            logger.warning(f"Failed to publish storage event: {e}")
+
+    async def run(self, redis: Redis, resync: Optional[Callable[[], None]] = None) -> None:
+        """
+        Применяет события других процессов, пока задача не отменена
+        :param resync: перестраивает состояние по данным; вызывается после каждой
+            повторной подписки, потому что события за время разрыва потеряны
+        """
+        subscribed = False
+        while True:
+            pubsub = redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.apply(message["data"])
+                    elif message["type"] == "subscribe":
+                        # Подтверждение приходит и после переподключения внутри redis-py
+                        if subscribed and resync is not None:
+                            self._resync(resync)
+                        subscribed = True
+            except RedisError as e:
+                logger.warning(f"Storage event subscription lost: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def _resync(self, resync: Callable[[], None]) -> None:
+        logger.info("Storage event subscription restored, resyncing")
+        try:
+            resync()
+        except Exception as e:
+            logger.error(f"Storage resync failed: {e}")
+
+    def apply(self, data: str) -> None:
+        event = json.loads(data)
+        storage = self._storages.get(event["file"])
+        if event["origin"] == self.origin or storage is None:
+            return
+        self._applying = True
+        try:
+            if event["event"] == "save":
+                storage.reload()
+            else:
+                storage.notify(event["event"], event["item"])
+        except Exception as e:
+            logger.error(f"Failed to apply storage event for {event['file']}: {e}")
+        finally:
+            self._applying = False
+
+storage_events = StorageEventBridge(f"{settings.UPDATE_QUEUE_PREFIX}:storage_events")
+
+def setup_storage_events(redis: Redis) -> None:
+    """
+    Пересылает изменения, от которых зависят очереди ведущего процесса:
+    записи расписания и пользователей, сохранения задач и целей для индекса дедлайнов
+    """
+    storage_events.publish_from(redis, (schedule_storage, user_storage), (task_storage, goal_storage))
@@ -0,0 +1,116 @@
+"""
+Трассировка обработки обновлений: дерево вложенных интервалов (spans)
+в contextvar, которое выводится через structlog для доли обновлений
+TRACE_SAMPLE_RATE и всегда для обновлений дольше TRACE_SLOW_THRESHOLD
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import structlog
+from config import settings
+
+logger = structlog.get_logger()
+
+class Span:
+    """Интервал с именем, атрибутами и вложенными интервалами"""
+    __slots__ = ("name", "attrs", "start", "end", "children", "error")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.children: List["Span"] = []
+        self.error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+class Trace:
+    def __init__(self, root: Span, sampled: bool):
+        self.root = root
+        self.sampled = sampled
+        self.spans = 1
+
+# Текущая трассировка и открытый в ней интервал
+_current: ContextVar[Optional[Tuple[Trace, Span]]] = ContextVar("trace_span", default=None)
+
+def tracing_enabled() -> bool:
+    return settings.TRACE_SAMPLE_RATE > 0 or settings.TRACE_SLOW_THRESHOLD > 0
+
+@contextmanager
+def start_trace(name: str, **attrs) -> Iterator[Optional[Span]]:
+    """Корневой интервал обработки; внутри уже идущей трассировки работает как span"""
+    if _current.get() is not None:
+        with span(name, **attrs) as child:
+            yield child
+        return
+    if not tracing_enabled():
+        yield None
+        return
+    root = Span(name, attrs)
+    trace = Trace(root, random.random() < settings.TRACE_SAMPLE_RATE)
+    token = _current.set((trace, root))
+    try:
+        yield root
+    except BaseException as e:
+        root.error = type(e).__name__
+        raise
+    finally:
+        root.end = time.perf_counter()
+        _current.reset(token)
+        _emit(trace)
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Optional[Span]]:
+    """Вложенный интервал; вне трассировки ничего не делает"""
+    current = _current.get()
+    if current is None:
+        yield None
+        return
+    trace, parent = current
+    if trace.spans >= settings.TRACE_MAX_SPANS:
+        yield None
+        return
+    child = Span(name, attrs)
+    parent.children.append(child)
+    trace.spans += 1
+    token = _current.set((trace, child))
+    try:
+        yield child
+    except BaseException as e:
+        child.error = type(e).__name__
+        raise
+    finally:
+        child.end = time.perf_counter()
+        _current.reset(token)
+
+def _render(node: Span, origin: float, depth: int, lines: List[str]) -> None:
+    attrs = " ".join(f"{key}={value}" for key, value in node.attrs.items())
+    line = f"{'  ' * depth}{node.name} {node.duration * 1000:.1f}ms @+{(node.start - origin) * 1000:.1f}ms"
+    if attrs:
+        line += f" {attrs}"
+    if node.error:
+        line += f" error={node.error}"
+    lines.append(line)
+    for child in node.children:
+        _render(child, origin, depth + 1, lines)
+
+def _emit(trace: Trace) -> None:
+    duration = trace.root.duration
+    slow = 0 < settings.TRACE_SLOW_THRESHOLD <= duration
+    if not (slow or trace.sampled):
+        return
+    lines: List[str] = []
+    _render(trace.root, trace.root.start, 0, lines)
+    log = logger.warning if slow else logger.info
+    log(
+        "Slow update" if slow else "Update trace",
+        duration_ms=round(duration * 1000, 1),
+        spans=lines,
+        truncated=trace.spans >= settings.TRACE_MAX_SPANS,
+        **trace.root.attrs
+    )
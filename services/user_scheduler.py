@@ -0,0 +1,204 @@
+"""
+Планировщик рассылок по часовому поясу каждого пользователя
+"""
+import asyncio
+import heapq
+import logging
+import time as time_module
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import pytz
+from aiogram import Bot
+from redis.exceptions import RedisError
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+JobAction = Callable[[Bot, List[int]], Awaitable[Any]]
+
+@dataclass(frozen=True)
+class DailyJob:
+    """Рассылка в заданное местное время пользователя"""
+    name: str
+    times: Tuple[time, ...]
+    action: JobAction
+    # 0 — понедельник; None — каждый день
+    weekday: Optional[int] = None
+
+@dataclass
+class ScheduledUser:
+    chat_id: int
+    tz: Any
+    # Меняется при смене часового пояса; старые записи в куче пропускаются
+    version: int = 0
+
+def get_timezone(name: Optional[str]):
+    """Возвращает часовой пояс по имени или пояс по умолчанию"""
+    try:
+        return pytz.timezone(name or settings.TZ)
+    except pytz.UnknownTimeZoneError:
+        logger.warning(f"Unknown timezone {name}, using {settings.TZ}")
+        return pytz.timezone(settings.TZ)
+
+class UserScheduler:
+    """
+    Одна куча на всех пользователей, упорядоченная по ближайшему срабатыванию.
+    Тик снимает с вершины только наступившие записи, поэтому его стоимость
+    зависит от числа срабатываний, а не от числа пользователей
+    """
+
+    def __init__(self, misfire_grace: int = 900):
+        self.misfire_grace = misfire_grace
+        self.jobs: Dict[str, DailyJob] = {}
+        self._users: Dict[int, ScheduledUser] = {}
+        # (время срабатывания, user_id, версия, имя рассылки)
+        self._heap: List[Tuple[float, int, int, str]] = []
+        # Кэш ближайшего срабатывания: у пользователей одного пояса оно совпадает
+        self._next_fire_cache: Dict[Tuple[str, str, int], float] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        # Последнее обработанное срабатывание по "user_id:рассылка"; хранится в хэше Redis,
+        # чтобы после перезапуска или смены реплики дослать пропущенное
+        self._last_fired: Dict[str, float] = {}
+        self._unsaved: Dict[str, float] = {}
+        self._redis = None
+        self._fired_key: Optional[str] = None
+
+    def add_job(self, job: DailyJob) -> None:
+        """Регистрирует рассылку; вызывается до загрузки пользователей"""
+        self.jobs[job.name] = job
+
+    async def restore(self, redis, key: str) -> None:
+        """Загружает последние срабатывания из хэша key; вызывается до load_users"""
+        self._redis = redis
+        self._fired_key = key
+        try:
+            stored = await redis.hgetall(key)
+        except RedisError as e:
+            logger.error(f"Failed to load last fire times: {e}")
+            return
+        for field, value in stored.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            fire_at = float(value)
+            if fire_at > self._last_fired.get(field, 0.0):
+                self._last_fired[field] = fire_at
+
+    def load_users(self, users: Iterable[Dict[str, Any]], now: Optional[float] = None) -> None:
+        """Заполняет кучу по списку пользователей из хранилища"""
+        now = time_module.time() if now is None else now
+        self._users.clear()
+        self._heap = []
+        for user in users:
+            scheduled = ScheduledUser(user.get("chat_id", user["user_id"]), get_timezone(user.get("timezone")))
+            self._users[user["user_id"]] = scheduled
+            for job in self.jobs.values():
+                self._heap.append((self._first_fire(job, user["user_id"], scheduled.tz, now), user["user_id"], 0, job.name))
+        heapq.heapify(self._heap)
+        logger.info(f"User scheduler loaded {len(self._users)} users, {len(self._heap)} entries")
+
+    def add_user(self, user_id: int, chat_id: int, timezone: Optional[str] = None, now: Optional[float] = None) -> None:
+        """Добавляет пользователя или пересчитывает его расписание"""
+        now = time_module.time() if now is None else now
+        previous = self._users.get(user_id)
+        scheduled = ScheduledUser(chat_id, get_timezone(timezone), previous.version + 1 if previous else 0)
+        self._users[user_id] = scheduled
+        for job in self.jobs.values():
+            heapq.heappush(self._heap, (self._next_fire(job, scheduled.tz, now), user_id, scheduled.version, job.name))
+
+    def collect_due(self, now: Optional[float] = None) -> Dict[str, List[int]]:
+        """
+        Снимает наступившие срабатывания и ставит следующие
+        :return: чаты для каждой рассылки
+        """
+        now = time_module.time() if now is None else now
+        due: Dict[str, List[int]] = {}
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            fire_at, user_id, version, job_name = heapq.heappop(heap)
+            user = self._users.get(user_id)
+            job = self.jobs.get(job_name)
+            if user is None or job is None or user.version != version:
+                continue
+            if now - fire_at <= self.misfire_grace:
+                due.setdefault(job_name, []).append(user.chat_id)
+            field = f"{user_id}:{job_name}"
+            self._last_fired[field] = self._unsaved[field] = fire_at
+            heapq.heappush(heap, (self._next_fire(job, user.tz, fire_at), user_id, version, job_name))
+        return due
+
+    async def tick(self, bot: Bot) -> None:
+        """Запускает наступившие рассылки; вызывается планировщиком каждые 30 секунд"""
+        due = self.collect_due()
+        await self._persist()
+        for job_name, chat_ids in due.items():
+            logger.info(f"Firing {job_name} for {len(chat_ids)} users")
+            # Рассылка идет в фоне, чтобы долгий fan-out не задерживал следующие тики
+            task = asyncio.create_task(self.jobs[job_name].action(bot, chat_ids))
+            self._tasks.add(task)
+            task.add_done_callback(self._on_task_done)
+
+    async def _persist(self) -> None:
+        """Записывает новые срабатывания одним HSET; при ошибке повторит на следующем тике"""
+        if self._redis is None or not self._unsaved:
+            return
+        pending, self._unsaved = self._unsaved, {}
+        try:
+            await self._redis.hset(self._fired_key, mapping=pending)
+        except RedisError as e:
+            logger.error(f"Failed to save last fire times: {e}")
+            for field, fire_at in pending.items():
+                self._unsaved.setdefault(field, fire_at)
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Scheduled broadcast failed: {task.exception()}")
+
+    def _first_fire(self, job: DailyJob, user_id: int, tz, now: float) -> float:
+        """
+        Первое срабатывание после загрузки: пропущенное за время простоя,
+        если оно было не раньше misfire_grace назад, иначе следующее
+        """
+        last = self._last_fired.get(f"{user_id}:{job.name}")
+        if last is not None:
+            missed = self._next_fire(job, tz, max(last, now - self.misfire_grace))
+            if missed <= now:
+                return missed
+        return self._next_fire(job, tz, now)
+
+    def _next_fire(self, job: DailyJob, tz, after: float) -> float:
+        """Ближайшее срабатывание рассылки строго после after в поясе tz"""
+        # Ключ по минуте: все пользователи пояса попадают в одну запись кэша
+        minute = int(after // 60)
+        key = (tz.zone, job.name, minute)
+        cached = self._next_fire_cache.get(key)
+        if cached is not None and cached > after:
+            return cached
+
+        local_now = datetime.fromtimestamp(after, tz)
+        result = None
+        for day_offset in range(8):
+            day = local_now.date() + timedelta(days=day_offset)
+            if job.weekday is not None and day.weekday() != job.weekday:
+                continue
+            for fire_time in job.times:
+                fire_at = tz.localize(datetime.combine(day, fire_time)).timestamp()
+                if fire_at > after and (result is None or fire_at < result):
+                    result = fire_at
+            if result is not None:
+                break
+
+        if len(self._next_fire_cache) > 100000:
+            self._next_fire_cache.clear()
+        self._next_fire_cache[key] = result
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает размер кучи и число пользователей"""
+        return {
+            "users": len(self._users),
+            "entries": len(self._heap),
+            "running": len(self._tasks)
+        }
+
+user_scheduler = UserScheduler(settings.SCHEDULER_MISFIRE_GRACE)
@@ -0,0 +1,124 @@
+"""
+Прием обновлений Telegram через вебхук на общем aiohttp-приложении
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+UpdateFeed = Callable[[Dict[str, Any]], Awaitable[None]]
+
+def get_webhook_secret() -> str:
+    """
+    Секрет из настроек или производный от токена бота: у всех реплик за
+    балансировщиком он совпадает без отдельной настройки
+    """
+    if settings.WEBHOOK_SECRET:
+        return settings.WEBHOOK_SECRET
+    return hmac.new(settings.BOT_TOKEN.encode(), b"webhook", hashlib.sha256).hexdigest()
+
+def make_dispatcher_feed(dispatcher: Dispatcher, bot: Bot) -> UpdateFeed:
+    """Передает сырое обновление диспетчеру и выполняет метод, возвращенный обработчиком"""
+    async def feed(update: Dict[str, Any]) -> None:
+        result = await dispatcher.feed_raw_update(bot, update)
+        if isinstance(result, TelegramMethod):
+            await dispatcher.silent_call_request(bot, result)
+    return feed
+
+class WebhookHandler:
+    """
+    Обработчик POST-запросов Telegram. Маршрут регистрируется до запуска
+    веб-сервера, а получатель обновлений подключается позже, когда бот готов:
+    до этого Telegram получает 503 и повторит доставку сам
+    """
+
+    def __init__(self, path: str, secret: str):
+        self.path = path
+        self.secret = secret
+        self.bot: Optional[Bot] = None
+        self._feed: Optional[UpdateFeed] = None
+        self._background = True
+        self._tasks: Set[asyncio.Task] = set()
+        self.received = 0
+
+    def register(self, app: web.Application) -> None:
+        app.router.add_post(self.path, self.handle)
+
+    def attach(self, bot: Bot, feed: UpdateFeed, background: bool = True) -> None:
+        """
+        :param feed: получатель обновлений: диспетчер или очередь шардов
+        :param background: отвечать Telegram до обработки; очередь быстрая,
+            и ответ после записи в нее гарантирует, что обновление не потеряется
+        """
+        self.bot = bot
+        self._feed = feed
+        self._background = background
+
+    async def handle(self, request: web.Request) -> web.Response:
+        received = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(received.encode(), self.secret.encode()):
+            logger.warning(f"Rejected webhook request from {request.remote}: bad secret token")
+            return web.Response(status=401)
+        if self._feed is None:
+            return web.Response(status=503)
+        try:
+            update = await request.json()
+        except json.JSONDecodeError:
+            return web.Response(status=400)
+
+        self.received += 1
+        if not self._background:
+            try:
+                await self._feed(update)
+            except Exception as e:
+                logger.error(f"Failed to enqueue webhook update {update.get('update_id')}: {e}")
+                return web.Response(status=503)
+            return web.json_response({})
+
+        # Ответ уходит сразу, обновление обрабатывается в фоне: долгий
+        # обработчик не задерживает доставку следующих обновлений
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.json_response({})
+
+    async def _process(self, update: Dict[str, Any]) -> None:
+        try:
+            await self._feed(update)
+        except Exception as e:
+            logger.error(f"Failed to process webhook update {update.get('update_id')}: {e}")
+
+    async def set_webhook(self, allowed_updates: list) -> None:
+        """Сообщает Telegram адрес вебхука; повторный вызов с теми же данными безопасен"""
+        url = settings.WEBHOOK_URL.rstrip("/") + self.path
+        await self.bot.set_webhook(
+            url,
+            secret_token=self.secret,
+            allowed_updates=allowed_updates,
+            max_connections=settings.WEBHOOK_MAX_CONNECTIONS
+        )
+        logger.info(f"Webhook set to {url}")
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Дожидается обработки уже принятых обновлений"""
+        if not self._tasks:
+            return
+        logger.info(f"Waiting for {len(self._tasks)} webhook updates to finish")
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {"received": self.received, "in_flight": len(self._tasks)}
+
+webhook_handler = WebhookHandler(settings.WEBHOOK_PATH, get_webhook_secret())